@@ -1,9 +1,8 @@
 try:
-    from core.component import BasicAdder
-except:
-    from .component import BasicAdder
+    from .component import BasicAdder, evaluate_truth_table
+except ImportError:
+    from core.component import BasicAdder, evaluate_truth_table
 
-from sympy import Symbol
 
 class Compressor_4_2(BasicAdder):
     def __init__(self):
@@ -173,13 +172,16 @@ class AND_GATE(BasicAdder):
     def forward(self,value_dict):
         # we use override the forward method to get the output of the AND_GATE
         # because we can't use the connection from multiplier to AND_GATE
-        output_dict={}
-        for output_switch_name,output_tag in self.output_switch_dict.items():
-            symbol={}
-            for key,value in self.input_value.items():
-                symbol[Symbol(key)]=value.subs(value_dict)
-            if not isinstance(self.node_dict[output_switch_name].get_logic_expression(),bool):
-                output_dict[output_tag]=self.node_dict[output_switch_name].get_logic_expression().subs(symbol)
-            else:
-                output_dict[output_tag]=self.node_dict[output_switch_name].get_logic_expression()
-        return output_dict
\ No newline at end of file
+        input_symbols, tables = self.compile_truth_table()
+        row = 0
+        for i, symbol in enumerate(input_symbols):
+            value = self.input_value[symbol.name]
+            value = value_dict[value] if value in value_dict else value.subs(value_dict)
+            if value:
+                row |= 1 << i
+        return {output_tag: (table >> row) & 1 for output_tag, table in tables.items()}
+
+    def forward_bitplane(self, value_dict, ones):
+        input_symbols, tables = self.compile_truth_table()
+        planes = [value_dict[self.input_value[symbol.name]] for symbol in input_symbols]
+        return {output_tag: evaluate_truth_table(table, planes, ones) for output_tag, table in tables.items()}
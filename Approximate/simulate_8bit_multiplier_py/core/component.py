@@ -5,6 +5,9 @@ import networkx as nx
 from sympy import Symbol
 from sympy.logic.boolalg import Not,Or
 
+# compiled truth tables shared by every adder with the same (class, mode, drop_type)
+_truth_table_cache = {}
+
 class Component:
     def __init__(self, switch_name:str, type:str, logic_expression,index:int):
         """
@@ -255,14 +258,60 @@ class BasicAdder:
             if output_tag==swich_name:
                 return self.node_dict[output_switch_name].get_logic_expression()
     
+    def truth_table_key(self):
+        return (type(self).__name__, getattr(self, "adder_type", "exact"), tuple(self.drop_type))
+
+    def compile_truth_table(self):
+        """
+        Compile the output logic expressions into integer truth tables.
+        return: (input_symbols, {output_tag: table}), bit `row` of table is the output value
+        for the input row `row=sum(input_i<<i)`. The result is cached per truth_table_key.
+        """
+        key = self.truth_table_key()
+        compiled = _truth_table_cache.get(key)
+        if compiled is not None:
+            return compiled
+
+        output_logic_expression = self.get_output_logic_expression()
+        free_symbols = set()
+        for expression in output_logic_expression.values():
+            if not isinstance(expression, bool):
+                free_symbols |= expression.free_symbols
+        input_symbols = tuple(Symbol(name) for name in self.switch_list if Symbol(name) in free_symbols)
+
+        tables = {}
+        for output_tag, expression in output_logic_expression.items():
+            table = 0
+            for row in range(1 << len(input_symbols)):
+                if isinstance(expression, bool):
+                    value = expression
+                else:
+                    value = expression.subs({symbol: bool((row >> i) & 1) for i, symbol in enumerate(input_symbols)})
+                if bool(value):
+                    table |= 1 << row
+            tables[output_tag] = table
+
+        compiled = (input_symbols, tables)
+        _truth_table_cache[key] = compiled
+        return compiled
+
     def forward(self,value_dict):
-        output_dict={}
-        for output_switch_name,output_tag in self.output_switch_dict.items():
-            if not isinstance(self.node_dict[output_switch_name].get_logic_expression(),bool):
-                output_dict[output_tag]=self.node_dict[output_switch_name].get_logic_expression().subs(value_dict)
-            else:
-                output_dict[output_tag]=self.node_dict[output_switch_name].get_logic_expression()
-        return output_dict
+        input_symbols, tables = self.compile_truth_table()
+        row = 0
+        for i, symbol in enumerate(input_symbols):
+            if value_dict[symbol]:
+                row |= 1 << i
+        return {output_tag: (table >> row) & 1 for output_tag, table in tables.items()}
+
+    def forward_bitplane(self, value_dict, ones):
+        """
+        Bit-sliced forward: every input is a packed bit-plane (numpy uint64 array or python int)
+        holding one bit per input vector, and the outputs are bit-planes of the same kind.
+        ones: the all-ones bit-plane, used for constant-true outputs.
+        """
+        input_symbols, tables = self.compile_truth_table()
+        planes = [value_dict[symbol] for symbol in input_symbols]
+        return {output_tag: evaluate_truth_table(table, planes, ones) for output_tag, table in tables.items()}
 
     def clear_input(self,swich_name:str):
         if hasattr(self,"input_value"):
@@ -280,3 +329,21 @@ class BasicAdder:
             else:
                 output_name_list.append(output_name)
         return output_name_list
+
+
+def evaluate_truth_table(table, planes, ones):
+    """
+    Evaluate a compiled truth table on bit-planes by Shannon expansion on the last input,
+    so only xor/and are needed: f = f0 ^ ((f0 ^ f1) & x).
+    """
+    n = len(planes)
+    if n == 0:
+        return ones if table & 1 else 0
+    half = 1 << (n - 1)
+    low = table & ((1 << half) - 1)
+    high = table >> half
+    f0 = evaluate_truth_table(low, planes[:-1], ones)
+    if low == high:
+        return f0
+    f1 = evaluate_truth_table(high, planes[:-1], ones)
+    return f0 ^ ((f0 ^ f1) & planes[-1])
@@ -1,13 +1,30 @@
 try:
-    from core.adder import FullAdder, HalfAdder,Compressor_4_2,AND_GATE
-except:
     from .adder import FullAdder, HalfAdder,Compressor_4_2,AND_GATE
+except ImportError:
+    from core.adder import FullAdder, HalfAdder,Compressor_4_2,AND_GATE
 from cv2 import add
 from numpy import False_
+import copy
+import numpy as np
 from sympy import Symbol
 import matplotlib.pyplot as plt
 import networkx as nx
 
+# choice encoding used by Find_best_approximation: choice -> (adder_type, drop_type)
+# 4 is the approximate compressor of Compressor_4_2, not LUT_4_2 of csv_generator/LUT_generator.py
+CONFIG_CHOICES = {
+    0: ("exact", ()),
+    1: ("exact", ("Cout",)),
+    2: ("exact", ("Carry",)),
+    3: ("exact", ("Cout", "Carry")),
+    4: ("approximate", ()),
+}
+
+# exact multiplier every from_config call is cloned from, and the prebuilt adder variants
+# {(adder_id, adder_type, drop_type): adder} shared by all multipliers built from it
+_template_multiplier = None
+_adder_variants = {}
+
 class Multiplier:
     def __init__(self) -> None:
         self.input_symbols = [
@@ -53,9 +70,38 @@ class Multiplier:
             "adders": {i: adder_id for i, adder_id in enumerate(sorted(self.adder.keys(), key=lambda x: int(x.split("_")[1])))}
         }
 
+        # per-wire bit-planes of the last forward_bitplane call, reused for incremental re-evaluation
+        self._bitplane_cache = None
+        # adders shared with other multipliers (prebuilt variants), copied before being modified
+        self._shared_adders = set()
+
         print(f"generate multiplier: ha[{adder_num['ha']}], fa[{adder_num['fa']}], ca[{adder_num['ca']}], and[{adder_num['and']}]")
         self._build_graph()
 
+    @classmethod
+    def from_config(cls, config):
+        """
+        Build a configured multiplier by cloning a cached exact template and plugging in
+        prebuilt, shared adder variants, no sympy graph is rebuilt once the variants exist.
+        :param config: {adder_id: choice} as printed by Find_best_approximation, e.g. {"ca_19": 3, ...},
+                       see CONFIG_CHOICES, or a tuple produced by get_config
+        """
+        global _template_multiplier
+        if _template_multiplier is None:
+            _template_multiplier = cls()
+            for adder_id, adder in _template_multiplier.adder.items():
+                _adder_variants[(adder_id, "exact", ())] = adder
+            _template_multiplier._shared_adders = set(_template_multiplier.adder_dict)
+
+        mul = copy.copy(_template_multiplier)
+        mul.adder = dict(_template_multiplier.adder)
+        mul.adder_dict = dict(_template_multiplier.adder_dict)
+        mul._shared_adders = set(_template_multiplier._shared_adders)
+        mul._bitplane_cache = None
+        if isinstance(config, dict):
+            config = decode_config(config)
+        return mul.apply_config(config)
+
     def connect(self, src_id, src_port, dst_id, dst_port):
         """
         连接两个加法器的输入和输出
@@ -386,6 +432,161 @@ class Multiplier:
         
         return output
 
+    def downstream_cone(self, adder_ids):
+        """
+        All adders reachable from adder_ids through self.connections, adder_ids included.
+        """
+        cone=set(adder_ids)
+        stack=list(adder_ids)
+        while stack:
+            adder_id=stack.pop()
+            for dst_id,dst_port in self.connections[adder_id]["outputs"]:
+                if dst_id not in cone:
+                    cone.add(dst_id)
+                    stack.append(dst_id)
+        return cone
+
+    def forward_bitplane(self, input_planes, ones, incremental=True):
+        """
+        Bit-sliced forward over many input vectors at once.
+        :param input_planes: {Symbol("a0"): plane, ..., Symbol("b7"): plane}, one packed bit-plane per input bit
+        :param ones: the all-ones bit-plane
+        :param incremental: reuse the bit-planes of the previous call for the same inputs and only recompute
+                            the downstream cone of adders whose configuration changed since then
+        :return: {adder_id: {port: plane}} for every AND gate and adder, in forward_sequence order
+        """
+        adder_keys={adder_id:adder.truth_table_key() for adder_id,adder in self.adder_dict.items()}
+        cache=self._bitplane_cache if incremental else None
+        if cache is not None and not _same_bitplanes(cache["inputs"], input_planes):
+            cache=None
+        if cache is None:
+            result={}
+            recompute=set(self.adder_dict)
+        else:
+            result=dict(cache["result"])
+            changed=[adder_id for adder_id,key in adder_keys.items() if cache["adder_keys"][adder_id]!=key]
+            recompute=self.downstream_cone(changed)
+
+        for index,value in self.forward_sequence["middle_values"].items():
+            if value in recompute:
+                result[value]=self.adder_dict[value].forward_bitplane(input_planes, ones)
+
+        for index,adder_value in self.forward_sequence["adders"].items():
+            if adder_value not in recompute:
+                continue
+            connection=self.connections[adder_value]
+            adder_input={}
+            for key,middle_value in connection["inputs"].items():
+                adder_input[Symbol(key)]=result[middle_value[0]][middle_value[1]]
+            result[adder_value]=self.adder_dict[adder_value].forward_bitplane(adder_input, ones)
+
+        self._bitplane_cache={"inputs": input_planes, "adder_keys": adder_keys, "result": result}
+        return result
+
+    def forward_batch(self, a_values, b_values):
+        """
+        Multiply many unsigned 8-bit operand pairs with one bit-sliced pass through the circuit.
+        :param a_values: array-like of integers in [0, 255]
+        :param b_values: array-like of integers in [0, 255], same length as a_values
+        :return: numpy int64 array of 16-bit products
+        """
+        a_values = np.asarray(a_values, dtype=np.int64)
+        b_values = np.asarray(b_values, dtype=np.int64)
+        if a_values.shape != b_values.shape:
+            raise ValueError(f"Operand shapes differ: {a_values.shape}, {b_values.shape}")
+        size = a_values.size
+
+        a_planes = pack_bitplanes(a_values.ravel())
+        b_planes = pack_bitplanes(b_values.ravel())
+        input_planes = {self.input_symbols[i]: a_planes[i] for i in range(8)}
+        input_planes.update({self.input_symbols[8+i]: b_planes[i] for i in range(8)})
+        ones = np.full_like(a_planes[0], np.iinfo(np.uint64).max)
+
+        result = self.forward_bitplane(input_planes, ones)
+        output_planes = []
+        for i in range(16):
+            key, value = next(iter(self.output_logic_expression[f"y{i}"].items()))
+            output_planes.append(np.broadcast_to(result[key][value], ones.shape))
+        return unpack_bitplanes(output_planes, size).reshape(a_values.shape)
+
+    def forward_batch_configs(self, configs, a_values, b_values):
+        """
+        Multiply many operand pairs under many configurations in one bit-sliced pass.
+        Every wire is a stack of distinct bit-planes plus, per configuration, the index of its plane in the stack,
+        so configurations that agree on an adder and on everything upstream of it share one computation.
+        Each adder is evaluated once per variant, vectorized over the distinct input combinations.
+        :param configs: list of configurations, {adder_id: choice} dicts or get_config tuples
+        :param a_values: array-like of integers in [0, 255]
+        :param b_values: array-like of integers in [0, 255], same length as a_values
+        :return: numpy int64 array of shape (len(configs), len(a_values)) with the 16-bit products
+        """
+        configs = [decode_config(config) if isinstance(config, dict) else tuple(config) for config in configs]
+        targets = [{adder_id: (adder_type, tuple(drop_type)) for adder_id, adder_type, drop_type in config}
+                   for config in configs]
+        for target in targets:
+            for adder_id in target:
+                if adder_id not in self.adder:
+                    raise ValueError(f"Invalid adder ID: {adder_id}")
+        a_values = np.asarray(a_values, dtype=np.int64).ravel()
+        b_values = np.asarray(b_values, dtype=np.int64).ravel()
+        if a_values.shape != b_values.shape:
+            raise ValueError(f"Operand shapes differ: {a_values.shape}, {b_values.shape}")
+        size = a_values.size
+        num_configs = len(configs)
+
+        a_planes = pack_bitplanes(a_values)
+        b_planes = pack_bitplanes(b_values)
+        input_planes = {self.input_symbols[i]: a_planes[i] for i in range(8)}
+        input_planes.update({self.input_symbols[8+i]: b_planes[i] for i in range(8)})
+        ones = np.full_like(a_planes[0], np.iinfo(np.uint64).max)
+
+        # variant of every adder in every configuration, as an index into variants[adder_id]
+        variants={}
+        variant_index={}
+        for index,adder_value in self.forward_sequence["adders"].items():
+            codes={}
+            variant_index[adder_value]=np.array([codes.setdefault(target.get(adder_value,("exact",())),len(codes))
+                                                 for target in targets], dtype=np.int64)
+            variants[adder_value]=list(codes)
+
+        # result[adder_id][port] = (stack of distinct planes, plane index of every configuration)
+        # AND gates are the same for every configuration
+        result={}
+        shared_index=np.zeros(num_configs, dtype=np.int64)
+        for index,value in self.forward_sequence["middle_values"].items():
+            outputs=self.adder_dict[value].forward_bitplane(input_planes, ones)
+            result[value]={output_tag: (np.broadcast_to(plane, (1,) + ones.shape), shared_index)
+                           for output_tag,plane in outputs.items()}
+
+        for index,adder_value in self.forward_sequence["adders"].items():
+            connection=self.connections[adder_value]
+            adder_input=[(Symbol(key), result[middle_value[0]][middle_value[1]])
+                         for key,middle_value in connection["inputs"].items()]
+
+            # configurations with the same variant and the same input planes share one evaluation;
+            # np.unique sorts the rows by variant, so the output stacks concatenate in row order
+            keys=np.column_stack([variant_index[adder_value]]+[plane_index for symbol,(stack,plane_index) in adder_input])
+            unique_keys,output_index=np.unique(keys, axis=0, return_inverse=True)
+
+            output_stacks={}
+            for code,(adder_type,drop_type) in enumerate(variants[adder_value]):
+                rows=unique_keys[unique_keys[:, 0]==code]
+                if len(rows)==0:
+                    continue
+                variant=get_adder_variant(self.adder[adder_value],adder_type,drop_type)
+                sub_input={symbol: stack[rows[:, 1+port]] for port,(symbol,(stack,plane_index)) in enumerate(adder_input)}
+                for output_tag,plane in variant.forward_bitplane(sub_input, ones).items():
+                    output_stacks.setdefault(output_tag,[]).append(np.broadcast_to(plane, (len(rows),) + ones.shape))
+            result[adder_value]={output_tag: (np.concatenate(stacks), output_index.ravel())
+                                 for output_tag,stacks in output_stacks.items()}
+
+        output_planes = []
+        for i in range(16):
+            key, value = next(iter(self.output_logic_expression[f"y{i}"].items()))
+            stack, plane_index = result[key][value]
+            output_planes.append(stack[plane_index])
+        return unpack_bitplanes(output_planes, size)
+
     def visualize_dependency_graph(self,name="multiplier_dependency_graph.png"):
         G = nx.DiGraph()
         for idex,(adder_id, adder) in enumerate(self.adder_dict.items()):
@@ -433,6 +634,7 @@ class Multiplier:
         else:
             raise ValueError(f"Invalid adder ID: {adder_id}")
         
+        self._own_adder(adder_tag_id)
         try:
             if isinstance(tag,str):
                 self.adder_dict[adder_tag_id].drop_output(tag)
@@ -444,6 +646,54 @@ class Multiplier:
         except:
             raise ValueError(f"Invalid tag: {tag}")
         
+    def get_config(self):
+        """
+        Compact description of how this multiplier differs from the exact one,
+        a tuple of (adder_id, adder_type, drop_type) for every modified adder.
+        It is hashable and cheap to pickle, unlike the multiplier itself.
+        """
+        config=[]
+        for index,adder_id in self.forward_sequence["adders"].items():
+            adder=self.adder_dict[adder_id]
+            adder_type=getattr(adder,"adder_type","exact")
+            if adder_type!="exact" or len(adder.drop_type)>0:
+                config.append((adder_id,adder_type,tuple(adder.drop_type)))
+        return tuple(config)
+
+    def apply_config(self,config):
+        """
+        Move this multiplier to a configuration produced by get_config, in place.
+        Adders whose configuration differs are swapped for a shared prebuilt variant, the others are kept,
+        so the cached bit-planes of forward_batch only need to be recomputed for their downstream cone.
+        """
+        target={adder_id:(adder_type,tuple(drop_type)) for adder_id,adder_type,drop_type in config}
+        for adder_id in target:
+            if adder_id not in self.adder:
+                raise ValueError(f"Invalid adder ID: {adder_id}")
+        for index,adder_id in self.forward_sequence["adders"].items():
+            adder=self.adder_dict[adder_id]
+            current=(getattr(adder,"adder_type","exact"),tuple(adder.drop_type))
+            adder_type,drop_type=target.get(adder_id,("exact",()))
+            if current==(adder_type,drop_type):
+                continue
+            adder=get_adder_variant(adder,adder_type,drop_type)
+            self.adder[adder_id]=adder
+            self.adder_dict[adder_id]=adder
+            self._shared_adders.add(adder_id)
+        return self
+
+    def _own_adder(self,adder_id):
+        # copy-on-write for adders shared with other multipliers
+        if adder_id in self._shared_adders:
+            adder=copy.deepcopy(self.adder_dict[adder_id])
+            if adder_id in self.adder:
+                self.adder[adder_id]=adder
+            else:
+                self.middle_values=dict(self.middle_values)
+                self.middle_values[adder_id]=adder
+            self.adder_dict[adder_id]=adder
+            self._shared_adders.discard(adder_id)
+
     def support_drop_type(self):
         support_drop_type_dict = {}
         for adder_id, adder in self.adder_dict.items():
@@ -468,6 +718,7 @@ class Multiplier:
         else:
             raise ValueError(f"Invalid adder ID: {adder_id}")
         
+        self._own_adder(adder_tag_id)
         self.adder_dict[adder_tag_id].convert_mode()
 
     def write_csv_file(self,file_dir="./mul_step"):
@@ -545,6 +796,80 @@ class Multiplier:
         
         generate_csv_file(file_dir,generation_operation_time)
 
+def decode_config(config):
+    """
+    Convert {adder_id: choice} (see CONFIG_CHOICES) into the get_config tuple format.
+    """
+    decoded=[]
+    for adder_id,choice in config.items():
+        if choice not in CONFIG_CHOICES:
+            raise ValueError(f"Invalid choice for {adder_id}: {choice}")
+        adder_type,drop_type=CONFIG_CHOICES[choice]
+        if adder_type!="exact" or len(drop_type)>0:
+            decoded.append((adder_id,adder_type,drop_type))
+    return tuple(decoded)
+
+def get_adder_variant(adder,adder_type,drop_type):
+    """
+    Prebuilt adder with the id and inputs of adder in the requested configuration, shared and never modified.
+    """
+    key=(adder.adder_id,adder_type,tuple(drop_type))
+    variant=_adder_variants.get(key)
+    if variant is None:
+        variant=type(adder)()
+        variant.set_id(adder.adder_id)
+        if hasattr(adder,"input_value"):
+            variant.input_value=dict(adder.input_value)
+        if adder_type!=getattr(variant,"adder_type","exact"):
+            if not hasattr(variant,"convert_mode"):
+                raise ValueError(f"Adder {adder.adder_id} does not support {adder_type} mode")
+            variant.convert_mode()
+        for drop in drop_type:
+            variant.drop_output(drop)
+        _adder_variants[key]=variant
+    return variant
+
+def _same_bitplanes(planes1, planes2):
+    if planes1 is planes2:
+        return True
+    if planes1.keys() != planes2.keys():
+        return False
+    return all(np.array_equal(planes1[key], planes2[key]) for key in planes1)
+
+def pack_bitplanes(values, bit_width=8):
+    """
+    Pack the bits of an integer array into bit-planes: plane i holds bit i of every value,
+    one value per bit of a numpy uint64 word array.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    words = (values.size + 63) // 64
+    planes = []
+    for i in range(bit_width):
+        bits = np.zeros(words * 64, dtype=np.uint8)
+        bits[:values.size] = (values >> i) & 1
+        planes.append(np.packbits(bits, bitorder="little").view(np.uint64))
+    return planes
+
+# _SPREAD_BITS[byte] has bit k of byte in byte k, used to transpose 8 bit-planes into bytes
+_SPREAD_BITS = np.array([sum(((value >> k) & 1) << (8 * k) for k in range(8)) for value in range(256)], dtype=np.uint64)
+
+def unpack_bitplanes(planes, size):
+    """
+    Inverse of pack_bitplanes: recombine bit-planes (LSB first) into an int64 array of length size.
+    Leading axes of the planes (e.g. configurations) are kept. Planes are transposed 8 at a time
+    into bytes with a 256-entry table instead of being unpacked bit by bit.
+    """
+    values = None
+    for group in range(0, len(planes), 8):
+        group_bytes = None
+        for i, plane in enumerate(planes[group:group + 8]):
+            plane_bytes = np.ascontiguousarray(plane, dtype=np.uint64).view(np.uint8)
+            spread = _SPREAD_BITS[plane_bytes] << np.uint64(i)
+            group_bytes = spread if group_bytes is None else group_bytes | spread
+        group_values = group_bytes.view(np.uint8)[..., :size].astype(np.int64) << group
+        values = group_values if values is None else values | group_values
+    return values
+
 def generate_operation_time(generation_operation_time,operation_list,replace_name_dict):
     for operation in operation_list:
         operation=operation.replace("(Sum)","")
@@ -0,0 +1,150 @@
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# bump when the meaning of a stored evaluation changes, old entries are then never hit again
+CACHE_VERSION = 1
+
+# per-user cache directory, not the source tree
+DEFAULT_CACHE_FILE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "simulate_8bit_multiplier", "evaluation_cache.sqlite"
+)
+
+# last-used timestamps of hits are written in batches of this size (and on put, evict and exit)
+ACCESS_FLUSH_SIZE = 256
+
+
+def config_key(config, settings):
+    """
+    Canonical hash of a multiplier configuration (Multiplier.get_config) and the evaluation settings.
+    Neither the order of the adders in config nor the order of the drops inside one adder matters.
+    """
+    canonical = {
+        "version": CACHE_VERSION,
+        "config": sorted([adder_id, adder_type, sorted(drop_type)] for adder_id, adder_type, drop_type in config),
+        "settings": settings,
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+class EvaluationCache:
+    """
+    On-disk (SQLite) cache of multiplier evaluations, shared by reruns and by every process on the machine.
+    Entries older than max_age seconds, or beyond the max_entries most recently used, are evicted on open.
+    Hits only read the database, their last-used timestamps are written in batches.
+    """
+
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE, max_age=None, max_entries=None):
+        self.cache_file = cache_file
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._connection = None
+        self._pid = None
+        self._accessed = {}
+        self.evict()
+        atexit.register(self.flush)
+
+    def _connect(self):
+        # sqlite connections must not be shared across fork, reopen in every process
+        if self._connection is None or self._pid != os.getpid():
+            if self._pid is not None:
+                # timestamps of the parent process are flushed by the parent
+                self._accessed = {}
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+            self._connection = sqlite3.connect(self.cache_file, timeout=30)
+            self._pid = os.getpid()
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations ("
+                "key TEXT PRIMARY KEY, config TEXT, settings TEXT, operation_step INTEGER, save_step REAL, "
+                "error_sum INTEGER, metrics TEXT, elapsed REAL, created REAL, last_access REAL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, config, settings):
+        """
+        :return: the stored evaluation dict, or None on a miss
+        """
+        connection = self._connect()
+        key = config_key(config, settings)
+        row = connection.execute(
+            "SELECT operation_step, save_step, error_sum, metrics, elapsed FROM evaluations WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._accessed[key] = time.time()
+        if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+            self.flush()
+        operation_step, save_step, error_sum, metrics, elapsed = row
+        return {
+            "operation_step": operation_step,
+            "save_step": save_step,
+            "error_sum": error_sum,
+            "metrics": json.loads(metrics),
+            "elapsed": elapsed,
+        }
+
+    def flush(self):
+        """
+        Write the pending last-used timestamps of hits in one transaction.
+        """
+        if not self._accessed:
+            return
+        connection = self._connect()
+        connection.executemany("UPDATE evaluations SET last_access = ? WHERE key = ?",
+                               [(last_access, key) for key, last_access in self._accessed.items()])
+        connection.commit()
+        self._accessed = {}
+
+    def put(self, config, settings, operation_step, save_step, error_sum, metrics=None, elapsed=None):
+        self.flush()
+        connection = self._connect()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                config_key(config, settings),
+                json.dumps([[adder_id, adder_type, list(drop_type)] for adder_id, adder_type, drop_type in config]),
+                json.dumps(settings, sort_keys=True),
+                int(operation_step),
+                float(save_step),
+                int(error_sum),
+                json.dumps(metrics or {}),
+                elapsed,
+                now,
+                now,
+            ),
+        )
+        connection.commit()
+
+    def evict(self, max_age=None, max_entries=None):
+        """
+        Drop entries not used for max_age seconds, then all but the max_entries most recently used ones.
+        Defaults to the limits given to the constructor.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        max_entries = self.max_entries if max_entries is None else max_entries
+        self.flush()
+        connection = self._connect()
+        if max_age is not None:
+            connection.execute("DELETE FROM evaluations WHERE last_access < ?", (time.time() - max_age,))
+        if max_entries is not None:
+            connection.execute(
+                "DELETE FROM evaluations WHERE key NOT IN "
+                "(SELECT key FROM evaluations ORDER BY last_access DESC LIMIT ?)",
+                (int(max_entries),),
+            )
+        connection.commit()
+
+    def clear(self):
+        self._accessed = {}
+        connection = self._connect()
+        connection.execute("DELETE FROM evaluations")
+        connection.commit()
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
@@ -0,0 +1,135 @@
+import numpy as np
+
+# keys of the dict returned by ErrorStatistics.result
+METRIC_NAMES = (
+    "count", "error_sum", "mae", "mse", "mred", "nmed", "error_rate", "bias",
+    "max_error", "worst_operands", "error_histogram",
+)
+
+# error_histogram[k] counts errors with 2 ** (k - 1) <= |error| < 2 ** k, error_histogram[0] the exact results
+HISTOGRAM_BINS = 64
+
+
+class ErrorStatistics:
+    """
+    Streaming error statistics of approximate against exact results, in one vectorized pass per chunk.
+    Every update reduces its chunk over the last axis, leading axes (e.g. a population of configurations) are kept.
+    Only running sums are stored, so any number of operand pairs can be streamed in bounded memory.
+    """
+
+    def __init__(self, max_value=None):
+        """
+        :param max_value: largest exact result magnitude NMED is normalized by, default the largest one seen
+        """
+        self.max_value = max_value
+        self.count = 0
+        self.error_sum = 0
+        self.squared_error_sum = 0.0
+        self.relative_error_sum = 0.0
+        self.signed_error_sum = 0
+        self.error_count = 0
+        self.max_exact = 0
+        self.max_error = None
+        self.worst_operands = None
+        self.histogram = None
+
+    def update(self, approx, exact, operands=None):
+        """
+        :param approx: approximate results, shape (..., n)
+        :param exact: exact results, broadcastable to approx
+        :param operands: optional tuple of operand arrays of shape (n,), reported for the worst case
+        """
+        approx = np.asarray(approx, dtype=np.int64)
+        exact = np.broadcast_to(np.asarray(exact, dtype=np.int64), approx.shape)
+        signed_errors = approx - exact
+        errors = np.abs(signed_errors)
+
+        self.count += errors.shape[-1]
+        self.error_sum = self.error_sum + errors.sum(axis=-1)
+        self.squared_error_sum = self.squared_error_sum + np.square(errors, dtype=np.float64).sum(axis=-1)
+        self.relative_error_sum = self.relative_error_sum + np.divide(
+            errors, np.abs(exact), out=np.zeros(errors.shape), where=exact != 0
+        ).sum(axis=-1)
+        self.signed_error_sum = self.signed_error_sum + signed_errors.sum(axis=-1)
+        self.error_count = self.error_count + np.count_nonzero(errors, axis=-1)
+        self.max_exact = max(self.max_exact, int(np.abs(exact).max(initial=0)))
+
+        # worst case of the chunk, kept where it beats the previous chunks
+        worst = errors.argmax(axis=-1)
+        chunk_max = np.take_along_axis(errors, worst[..., None], axis=-1)[..., 0]
+        chunk_operands = None if operands is None else np.stack([np.asarray(op)[worst] for op in operands], axis=-1)
+        if self.max_error is None:
+            self.max_error, self.worst_operands = chunk_max, chunk_operands
+        else:
+            better = chunk_max > self.max_error
+            self.max_error = np.where(better, chunk_max, self.max_error)
+            if chunk_operands is not None:
+                self.worst_operands = np.where(better[..., None], chunk_operands, self.worst_operands)
+
+        # bit length of |error| as histogram bin, one bincount over all leading rows
+        bins = np.frexp(errors)[1]
+        rows = np.arange(int(np.prod(errors.shape[:-1]))).reshape(errors.shape[:-1] + (1,))
+        histogram = np.bincount((rows * HISTOGRAM_BINS + bins).ravel(), minlength=rows.size * HISTOGRAM_BINS)
+        histogram = histogram.reshape(errors.shape[:-1] + (HISTOGRAM_BINS,))
+        self.histogram = histogram if self.histogram is None else self.histogram + histogram
+
+    def result(self):
+        """
+        :return: dict with the METRIC_NAMES, every value an array over the leading axes of the updates
+        """
+        max_value = self.max_value if self.max_value is not None else self.max_exact
+        mae = self.error_sum / self.count
+        return {
+            "count": self.count,
+            "error_sum": self.error_sum,
+            "mae": mae,
+            "mse": self.squared_error_sum / self.count,
+            "mred": self.relative_error_sum / self.count,
+            "nmed": mae / max_value if max_value else mae * 0.0,
+            "error_rate": self.error_count / self.count,
+            "bias": self.signed_error_sum / self.count,
+            "max_error": self.max_error,
+            "worst_operands": self.worst_operands,
+            "error_histogram": self.histogram,
+        }
+
+
+def error_metrics(approx, exact, operands=None, max_value=None):
+    """
+    All metrics of ErrorStatistics for results held in memory at once.
+    """
+    statistics = ErrorStatistics(max_value)
+    statistics.update(approx, exact, operands)
+    return statistics.result()
+
+
+def lut_error_metrics(lut, operand_values=None, exclude=()):
+    """
+    :param lut: 2D LUT, entry [i, j] holds the approximate product of operand_values[i] and operand_values[j]
+    :param operand_values: default the signed 8-bit range, i.e. entry [a + 128, b + 128]
+    :param exclude: operand pairs (a, b) left out, e.g. ((-128, -128),) like the LUT CSVs
+    """
+    if operand_values is None:
+        operand_values = np.arange(-128, 128)
+    a, b = np.meshgrid(operand_values, operand_values, indexing="ij")
+    keep = np.ones(a.shape, dtype=bool)
+    for excluded_a, excluded_b in exclude:
+        keep &= ~((a == excluded_a) & (b == excluded_b))
+    return error_metrics(np.asarray(lut)[keep], a[keep] * b[keep], operands=(a[keep], b[keep]))
+
+
+def stream_error_metrics(multiply, bit_width=8, signed=False, chunk_size=1 << 20, max_value=None):
+    """
+    Metrics of an approximate multiply(a, b) over every operand pair of a bit width, streamed in chunks
+    so wider multipliers never materialize the full table.
+    :param multiply: vectorized function of two operand arrays
+    """
+    low = -(1 << (bit_width - 1)) if signed else 0
+    size = 1 << bit_width
+    statistics = ErrorStatistics(max_value)
+    for start in range(0, size * size, chunk_size):
+        index = np.arange(start, min(start + chunk_size, size * size), dtype=np.int64)
+        a = index // size + low
+        b = index % size + low
+        statistics.update(multiply(a, b), a * b, operands=(a, b))
+    return statistics.result()
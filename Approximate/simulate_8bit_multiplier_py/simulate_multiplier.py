@@ -1,9 +1,18 @@
 from random import randint, seed
 import numpy as np
-from core import Multiplier
+try:
+    from .core import Multiplier
+    from .evaluation_cache import EvaluationCache
+    from .metrics import error_metrics, METRIC_NAMES
+except ImportError:
+    from core import Multiplier
+    from evaluation_cache import EvaluationCache
+    from metrics import error_metrics, METRIC_NAMES
 from functools import partial
 from concurrent.futures import ProcessPoolExecutor
+import atexit
 import math
+import time
 from more_itertools import chunked
 
 seed(42)
@@ -12,6 +21,25 @@ np.random.seed(42)
 _cached_samples = None
 _cached_standard_res = None
 _cached_binary_inputs = None
+_cached_all_values = None
+_cached_sample_time = None
+_cached_standard_step = None
+_cached_stratified_order = None
+_executor = None
+_evaluation_cache = None
+
+SAMPLE_SIZE = 200
+# evaluation cache eviction: entries unused for 30 days, and beyond the 100000 most recently used
+CACHE_MAX_AGE = 30 * 24 * 3600
+CACHE_MAX_ENTRIES = 100000
+# multi-fidelity evaluation: operand pairs evaluated after every rung, the last rung is all of them
+FIDELITY_LADDER = (1024, 8192, 65536)
+# 0 stops a candidate only on the exact error bound, 1 already on the plain extrapolated error
+FIDELITY_SLACK = 0
+
+# worker side state, filled lazily inside every pool process
+_worker_muls = {}
+_WORKER_CACHE_SIZE = 8
 
 def unsigned_to_binary(a, bit_width=8):
     return [int(bit) for bit in format(a, f"0{bit_width}b")]
@@ -30,14 +58,27 @@ def generate_samples(sample_size=2000):
         _cached_samples = large_numbers + medium_numbers + small_numbers + [(a, b) for a in corner_case for b in corner_case]
     return _cached_samples
 
-# def generate_all_values():
-##     very slow, so we use the sample method
-#     global _cached_samples
-#     if _cached_samples is None:
-#         _cached_samples=[]
-#         for a,b in product(range(256),range(256)):
-#             _cached_samples.append((a,b))
-#     return _cached_samples
+def generate_all_values():
+    # every unsigned 8-bit operand pair, as two flat arrays for Multiplier.forward_batch
+    global _cached_all_values
+    if _cached_all_values is None:
+        a_values, b_values = np.meshgrid(np.arange(256), np.arange(256), indexing="ij")
+        _cached_all_values = (a_values.ravel(), b_values.ravel())
+    return _cached_all_values
+
+def get_stratified_order():
+    """
+    Permutation of generate_all_values() whose every prefix of k * 256 pairs holds k pairs of each
+    16x16 operand cell, so small prefixes cover all operand magnitudes evenly.
+    """
+    global _cached_stratified_order
+    if _cached_stratified_order is None:
+        a_values, b_values = generate_all_values()
+        cells = (a_values >> 4) * 16 + (b_values >> 4)
+        by_cell = np.argsort(cells, kind="stable").reshape(256, -1)
+        by_cell = np.random.default_rng(42).permuted(by_cell, axis=1)
+        _cached_stratified_order = by_cell.T.ravel()
+    return _cached_stratified_order
 
 def get_standard_res(samples):
     global _cached_standard_res
@@ -58,6 +99,170 @@ def process_samples_batch(samples, mul):
         results.append(binary_to_unsigned(res))
     return results
 
+def get_standard_step():
+    global _cached_standard_step
+    if _cached_standard_step is None:
+        _cached_standard_step = Multiplier().operation_step()
+    return _cached_standard_step
+
+def get_worker_multiplier(config):
+    """
+    Look up (or build from the cached template multiplier) the multiplier for config inside a worker.
+    """
+    mul = _worker_muls.get(config)
+    if mul is None:
+        mul = Multiplier.from_config(config)
+        if len(_worker_muls) >= _WORKER_CACHE_SIZE:
+            del _worker_muls[next(iter(_worker_muls))]
+        _worker_muls[config] = mul
+    return mul
+
+def process_config_batch(samples, config):
+    return process_samples_batch(samples, get_worker_multiplier(config))
+
+def get_executor():
+    # one pool for the whole run, reused across evaluate calls
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor()
+        atexit.register(shutdown_executor)
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+def estimate_sampled_time(mul, total_samples, calibration_size=64):
+    """
+    Estimate how long the per-sample forward path (process_samples_batch) would need for total_samples,
+    extrapolated from a small calibration batch on a single process.
+    """
+    global _cached_sample_time
+    if _cached_sample_time is None:
+        calibration = get_binary_inputs(generate_samples(SAMPLE_SIZE))[:calibration_size]
+        start = time.time()
+        process_samples_batch(calibration, mul)
+        _cached_sample_time = (time.time() - start) / len(calibration)
+    return _cached_sample_time * total_samples
+
+def select_statistics(stats, index=()):
+    # plain python values of one entry of error_metrics, e.g. one configuration of a population
+    return {key: (np.asarray(value)[index] if np.ndim(value) and index != () else np.asarray(value)).tolist()
+            for key, value in stats.items()}
+
+def exhaustive_error_statistics(mul):
+    """
+    Exact error statistics of mul over all 256x256 unsigned operand pairs, using the bit-sliced engine.
+    """
+    a_values, b_values = generate_all_values()
+    start = time.time()
+    results = mul.forward_batch(a_values, b_values)
+    elapsed = time.time() - start
+
+    stats = select_statistics(error_metrics(results, a_values * b_values, operands=(a_values, b_values)))
+    stats["elapsed"] = elapsed
+    stats["sampled_time_estimate"] = estimate_sampled_time(mul, results.size)
+    return stats
+
+def multi_fidelity_error_statistics(mul, save_step, best_score=None, ladder=FIDELITY_LADDER, slack=FIDELITY_SLACK):
+    """
+    Error statistics over all operand pairs, evaluated rung by rung on growing stratified subsets of them.
+    The error sum of a subset is a lower bound of the full one. Once the optimistic score, from the larger of
+    that bound and slack times the extrapolated error sum, falls below best_score the candidate is stopped.
+    With the default slack 0 this only happens when the candidate provably cannot win.
+    :return: (statistics, number of operand pairs evaluated), when stopped early the statistics only hold
+             the error_sum the decision used, the extrapolated_error_sum and early_stopped=True
+    """
+    a_values, b_values = generate_all_values()
+    order = get_stratified_order()
+    results = []
+    error_sum = 0
+    evaluated = 0
+    for size in sorted(set(ladder) | {order.size}):
+        index = order[evaluated:size]
+        results.append(mul.forward_batch(a_values[index], b_values[index]))
+        error_sum += int(np.abs(results[-1] - a_values[index] * b_values[index]).sum())
+        evaluated = size
+        if best_score is None or evaluated == order.size:
+            continue
+        estimate = error_sum * order.size / evaluated
+        bound = max(error_sum, slack * estimate)
+        optimistic = save_step / (bound + 1e-2) if save_step > 0 else 0.0
+        if optimistic < best_score:
+            return {"error_sum": bound, "extrapolated_error_sum": estimate, "early_stopped": True}, evaluated
+
+    stats = error_metrics(np.concatenate(results), a_values[order] * b_values[order],
+                          operands=(a_values[order], b_values[order]))
+    return select_statistics(stats), evaluated
+
+def evaluation_settings(exhaustive):
+    # everything besides the configuration that an evaluation result depends on
+    if exhaustive:
+        return {"mode": "exhaustive"}
+    return {"mode": "sampled", "sample_size": SAMPLE_SIZE, "seed": 42}
+
+def get_evaluation_cache():
+    global _evaluation_cache
+    if _evaluation_cache is None:
+        _evaluation_cache = EvaluationCache(max_age=CACHE_MAX_AGE, max_entries=CACHE_MAX_ENTRIES)
+    return _evaluation_cache
+
+def evaluate_population(configs, adder_names=None, exhaustive=True, use_cache=True):
+    """
+    Score a whole population of configurations in one vectorized pass.
+    :param configs: N configuration vectors of choices ordered like adder_names (e.g. HA_NAMES + FA_NAMES + CA_NAMES
+                    in Find_best_approximation), or N {adder_id: choice} dicts when adder_names is None
+    :param exhaustive: all 65536 operand pairs if True, otherwise the cached sample set of evaluate
+    :param use_cache: take configurations already in the evaluation cache from it, and store the new ones
+    :return: one dict per configuration with operation_step, save_step, error metrics and the evaluate score
+    """
+    if adder_names is not None:
+        configs = [dict(zip(adder_names, (int(choice) for choice in config))) for config in configs]
+    muls = [Multiplier.from_config(config) for config in configs]
+    configs = [mul.get_config() for mul in muls]
+    settings = evaluation_settings(exhaustive)
+    standard_step = get_standard_step()
+
+    population = [None] * len(configs)
+    misses = []
+    for i, config in enumerate(configs):
+        cached = get_evaluation_cache().get(config, settings) if use_cache else None
+        if cached is not None and all(name in cached["metrics"] for name in METRIC_NAMES):
+            population[i] = {"operation_step": cached["operation_step"], "save_step": cached["save_step"]}
+            population[i].update(cached["metrics"])
+        else:
+            misses.append(i)
+
+    start = time.time()
+    if misses:
+        if exhaustive:
+            a_values, b_values = generate_all_values()
+        else:
+            samples = generate_samples(SAMPLE_SIZE)
+            a_values = np.array([a for a, b in samples])
+            b_values = np.array([b for a, b in samples])
+        results = muls[0].forward_batch_configs([configs[i] for i in misses], a_values, b_values)
+        stats = error_metrics(results, a_values * b_values, operands=(a_values, b_values))
+        elapsed = time.time() - start
+
+        for row, i in enumerate(misses):
+            operation_step = muls[i].operation_step()
+            save_step = (standard_step - operation_step) / standard_step
+            metrics = select_statistics(stats, row)
+            if use_cache:
+                get_evaluation_cache().put(configs[i], settings, operation_step, save_step, metrics["error_sum"],
+                                           metrics, elapsed / len(misses))
+            population[i] = {"operation_step": operation_step, "save_step": save_step}
+            population[i].update(metrics)
+
+    for entry in population:
+        entry["score"] = entry["save_step"] / (entry["error_sum"] + 1e-2)
+    print(f"Population: {len(configs)} configurations, {len(configs) - len(misses)} cached, "
+          f"Time: {time.time() - start:.4f}s")
+    return population
+
 def timeit(func):
     def wrapper(*args, **kwargs):
         import time
@@ -71,28 +276,70 @@ def determine_batch_size(total_samples, num_workers):
     return math.ceil(total_samples / num_workers)
 
 @timeit
-def evaluate(mul):
-    standard_mul = Multiplier()
-    standard_mul_total_step = standard_mul.operation_step()
+def evaluate(mul, exhaustive=False, use_cache=True, multi_fidelity=False, best_score=None):
+    """
+    :param exhaustive: error over all 65536 operand pairs instead of the sample set
+    :param multi_fidelity: error over all operand pairs along FIDELITY_LADDER, stopping early once the candidate
+                           cannot beat best_score; a stopped candidate returns the optimistic score it was
+                           stopped on, an upper bound rather than a measurement (see evaluate_with_status)
+    """
+    return evaluate_with_status(mul, exhaustive, use_cache, multi_fidelity, best_score)[0]
+
+def evaluate_with_status(mul, exhaustive=False, use_cache=True, multi_fidelity=False, best_score=None):
+    """
+    Like evaluate.
+    :return: (score, early_stopped), early_stopped tells a multi-fidelity candidate stopped on its bound
+             from a full evaluation
+    """
+    config = mul.get_config()
+    # a completed fidelity ladder is an exhaustive evaluation
+    settings = evaluation_settings(exhaustive or multi_fidelity)
+    if use_cache:
+        cached = get_evaluation_cache().get(config, settings)
+        if cached is not None:
+            print(f"Cached: Save Step Ratio: {cached['save_step']:.6f}, Error Sum: {cached['error_sum']}")
+            return cached["save_step"] / (cached["error_sum"] + 1e-2), False
+
+    start = time.time()
+    standard_mul_total_step = get_standard_step()
     mul_total_step = mul.operation_step()
 
     save_step = (standard_mul_total_step - mul_total_step) / standard_mul_total_step
 
-    # 6000 samples，30 seconds, 5 min for all possible values.
-    samples = generate_samples(200)
-    standard_res = get_standard_res(samples)
-    binary_inputs = get_binary_inputs(samples)
+    if multi_fidelity:
+        stats, evaluated = multi_fidelity_error_statistics(mul, save_step, best_score)
+        if stats.get("early_stopped"):
+            print(f"Stopped after {evaluated} operand pairs, Save Step Ratio: {save_step:.6f}, "
+                  f"Error Sum Bound: {stats['error_sum']:.0f} (extrapolated {stats['extrapolated_error_sum']:.0f})")
+            return save_step / (stats["error_sum"] + 1e-2), True
+    elif exhaustive:
+        # all 65536 operand pairs through the bit-sliced engine
+        stats = exhaustive_error_statistics(mul)
+        print(f"Exhaustive: MAE: {stats['mae']:.4f}, MSE: {stats['mse']:.4f}, MRED: {stats['mred'] * 100:.4f}%, "
+              f"NMED: {stats['nmed']:.6f}, Bias: {stats['bias']:.4f}, "
+              f"Max Error: {stats['max_error']} at {tuple(stats['worst_operands'])}, Error Rate: {stats['error_rate']:.4f}, "
+              f"Time: {stats['elapsed']:.4f}s (sampled path would need ~{stats['sampled_time_estimate']:.1f}s)")
+    else:
+        # 6000 samples，30 seconds, 5 min for all possible values.
+        samples = generate_samples(SAMPLE_SIZE)
+        standard_res = get_standard_res(samples)
+        binary_inputs = get_binary_inputs(samples)
 
-    with ProcessPoolExecutor() as executor:
+        # only the compact configuration is sent, workers rebuild or reuse the multiplier
+        executor = get_executor()
         num_workers = executor._max_workers  # 获取线程数
         batch_size = determine_batch_size(len(binary_inputs), num_workers)
         batches = chunked(binary_inputs, batch_size)
-        results = sum(executor.map(partial(process_samples_batch, mul=mul), batches), [])
+        results = sum(executor.map(partial(process_config_batch, config=config), batches), [])
+
+        # Calculate errors
+        stats = select_statistics(error_metrics(results, np.array(standard_res), operands=tuple(np.array(samples).T)))
 
-    # Calculate errors
-    error_sum = sum(abs(res - std) for res, std in zip(results, standard_res))
+    error_sum = stats["error_sum"]
+    if use_cache:
+        get_evaluation_cache().put(config, settings, mul_total_step, save_step, error_sum, stats, time.time() - start)
     print(f"Save Step Ratio: {save_step:.6f}, Error Sum: {error_sum}")
-    return save_step / (error_sum + 1e-2)
+    return save_step / (error_sum + 1e-2), False
 
 if __name__ == "__main__":
     mul = Multiplier()
@@ -108,4 +355,7 @@ if __name__ == "__main__":
     mul.drop_adder_Carry_or_Cout("ha_13","Cout")
     evaluate_value = evaluate(mul)
     print(f"Evaluation Value: {evaluate_value}")
+    # exact error over every operand pair
+    evaluate_value = evaluate(mul, exhaustive=True)
+    print(f"Evaluation Value: {evaluate_value}")
     # 近似乘法器得启发式，如果是遗传算法，可以将加法器1~35作为gene，然后ha和fa取值是0或1，ca取值是0或1或2或3，然后通过遗传算法进行迭代
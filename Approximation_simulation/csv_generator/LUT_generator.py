@@ -0,0 +1,506 @@
+import argparse
+import ast
+import csv
+import os
+import re
+import sys
+
+import numpy as np
+
+import lut_format
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Approximate"))
+from simulate_8bit_multiplier_py.metrics import lut_error_metrics  # noqa: E402
+
+# approximate 4:2 compressor, (x1, x2, x3, x4, cin) -> (cout, carry, sum_bit)
+LUT_4_2 = {
+    (0, 0, 0, 0, 0): (0, 0, 1),
+    (0, 0, 0, 0, 1): (0, 1, 0),
+    (0, 0, 0, 1, 0): (0, 1, 0),
+    (0, 0, 0, 1, 1): (0, 1, 0),
+    (0, 0, 1, 0, 0): (0, 0, 1),
+    (0, 0, 1, 0, 1): (0, 1, 0),
+    (0, 0, 1, 1, 0): (0, 1, 0),
+    (0, 0, 1, 1, 1): (0, 1, 0),
+    (0, 1, 0, 0, 0): (0, 0, 1),
+    (0, 1, 0, 0, 1): (0, 1, 0),
+    (0, 1, 0, 1, 0): (0, 1, 0),
+    (0, 1, 0, 1, 1): (0, 1, 0),
+    (0, 1, 1, 0, 0): (1, 0, 1),
+    (0, 1, 1, 0, 1): (1, 1, 0),
+    (0, 1, 1, 1, 0): (1, 0, 1),
+    (0, 1, 1, 1, 1): (1, 1, 0),
+    (1, 0, 0, 0, 0): (0, 0, 1),
+    (1, 0, 0, 0, 1): (0, 1, 0),
+    (1, 0, 0, 1, 0): (0, 1, 0),
+    (1, 0, 0, 1, 1): (0, 1, 0),
+    (1, 0, 1, 0, 0): (1, 0, 1),
+    (1, 0, 1, 0, 1): (1, 1, 0),
+    (1, 0, 1, 1, 0): (1, 0, 1),
+    (1, 0, 1, 1, 1): (1, 1, 0),
+    (1, 1, 0, 0, 0): (1, 0, 1),
+    (1, 1, 0, 0, 1): (1, 1, 0),
+    (1, 1, 0, 1, 0): (1, 0, 1),
+    (1, 1, 0, 1, 1): (1, 1, 0),
+    (1, 1, 1, 0, 0): (1, 0, 1),
+    (1, 1, 1, 0, 1): (1, 1, 0),
+    (1, 1, 1, 1, 0): (1, 1, 0),
+    (1, 1, 1, 1, 1): (1, 1, 1),
+}
+
+# the same table indexed by x1 * 16 + x2 * 8 + x3 * 4 + x4 * 2 + cin
+LUT_4_2_TABLE = np.array([LUT_4_2[key] for key in sorted(LUT_4_2)], dtype=np.uint8)
+
+
+class LogicGates:
+    """
+    Implements basic logic gates using only NAND.
+    Each static method returns 0 or 1 given two input bits (0 or 1).
+    """
+
+    @staticmethod
+    def nand_gate(a, b):
+        """
+        Returns the NAND of two bits a and b.
+        NAND = NOT(a AND b)
+        Also works elementwise on numpy uint8 arrays of bits, so the whole network can run on all operand pairs at once.
+        :param a: bit 0 or 1
+        :param b: bit 0 or 1
+        :return: 0 or 1
+        """
+        return 1 - (a & b)
+
+    @staticmethod
+    def xor_gate(a, b):
+        """
+        Returns the XOR of two bits a and b, implemented using NAND gates.
+        XOR = a ^ b
+        :param a: bit 0 or 1
+        :param b: bit 0 or 1
+        :return: 0 or 1
+        """
+        return LogicGates.nand_gate(
+            LogicGates.nand_gate(a, LogicGates.nand_gate(a, b)),
+            LogicGates.nand_gate(b, LogicGates.nand_gate(a, b))
+        )
+
+    @staticmethod
+    def and_gate(a, b):
+        """
+        Returns the AND of two bits a and b, implemented using NAND gates.
+        AND = a & b
+        :param a: bit 0 or 1
+        :param b: bit 0 or 1
+        :return: 0 or 1
+        """
+        return LogicGates.nand_gate(
+            LogicGates.nand_gate(a, b),
+            LogicGates.nand_gate(a, b)
+        )
+
+    @staticmethod
+    def or_gate(a, b):
+        """
+        Returns the OR of two bits a and b, implemented using NAND gates.
+        OR = a | b
+        :param a: bit 0 or 1
+        :param b: bit 0 or 1
+        :return: 0 or 1
+        """
+        return LogicGates.nand_gate(
+            LogicGates.nand_gate(a, a),
+            LogicGates.nand_gate(b, b)
+        )
+
+
+class Adder:
+    """
+    Implements half-adder and full-adder using basic logic gates.
+    A half-adder adds two bits and produces a sum bit and a carry bit.
+    A full-adder adds three bits (including a carry-in) and produces a sum bit and a carry-out.
+    """
+
+    @staticmethod
+    def half_adder(a, b, ignore=0):
+        """
+        Half-Adder using XOR for the sum and AND for the carry.
+        :param a: bit 0 or 1
+        :param b: bit 0 or 1
+        :return: (sum_bit, carry_bit)
+        """
+        sum_bit = LogicGates.xor_gate(a, b)
+        carry = LogicGates.and_gate(a, b)
+        if ignore == 1:
+            carry = 0
+        return sum_bit, carry
+
+    @staticmethod
+    def full_adder(a, b, cin, ignore=0):
+        """
+        Full-Adder constructed from two half-adders and an OR gate.
+        sum = (a ^ b) ^ cin
+        carry_out = (a & b) | ( (a ^ b) & cin )
+        :param ignore: 1 drops the carry
+        :param a: bit 0 or 1
+        :param b: bit 0 or 1
+        :param cin: carry-in bit 0 or 1
+        :return: (sum_bit, carry_out_bit)
+        """
+        sum1, carry1 = Adder.half_adder(a, b)
+        sum_bit, carry2 = Adder.half_adder(sum1, cin)
+        carry_out = LogicGates.or_gate(carry1, carry2)
+        if ignore == 1:
+            carry_out = 0
+        return sum_bit, carry_out
+
+
+class Compressor:
+    """
+    Implements a 4:2 Compressor using only NAND-based logic gates.
+    A 4:2 compressor compresses four input bits plus a carry-in bit
+    into two output bits (sum and carry), plus an additional carry-out.
+    """
+
+    @staticmethod
+    def full_adder_sum(g4, x3):
+        """
+        Part of the full-adder sum logic used in the compressor.
+        :param g4: intermediate XOR result
+        :param x3: one of the bits to be added
+        :return: sum bit
+        """
+        return LogicGates.nand_gate(
+            LogicGates.nand_gate(LogicGates.nand_gate(g4, x3), g4),
+            LogicGates.nand_gate(LogicGates.nand_gate(g4, x3), x3)
+        )
+
+    @staticmethod
+    def full_adder_cout(x1, x2, g4, x3):
+        """
+        Part of the full-adder carry-out logic used in the compressor.
+        :param x1: bit to add
+        :param x2: bit to add
+        :param g4: intermediate XOR result
+        :param x3: bit to add
+        :return: carry-out bit
+        """
+        return LogicGates.nand_gate(
+            LogicGates.nand_gate(x1, x2),
+            LogicGates.nand_gate(g4, x3)
+        )
+
+    @staticmethod
+    def carry_output(s, x4, cin):
+        """
+        Computes the carry output in the 4:2 compressor.
+        :param s: sum bit from the first stage
+        :param x4: bit to add
+        :param cin: carry-in bit
+        :return: carry bit
+        """
+        return LogicGates.nand_gate(
+            LogicGates.nand_gate(LogicGates.xor_gate(s, x4), cin),
+            LogicGates.nand_gate(s, x4)
+        )
+
+    @staticmethod
+    def sum_output(s, x4, cin):
+        """
+        Computes the final sum output in the 4:2 compressor.
+        :param s: sum bit from the first stage
+        :param x4: bit to add
+        :param cin: carry-in bit
+        :return: sum bit
+        """
+        return LogicGates.nand_gate(
+            LogicGates.nand_gate(
+                LogicGates.nand_gate(LogicGates.xor_gate(s, x4), cin),
+                LogicGates.xor_gate(s, x4)
+            ),
+            LogicGates.nand_gate(
+                LogicGates.nand_gate(LogicGates.xor_gate(s, x4), cin),
+                cin
+            )
+        )
+
+    @staticmethod
+    def compressor_4_to_2(x1, x2, x3, x4, cin, ignore=0):
+        """
+        4:2 compressor that takes in four bits (x1, x2, x3, x4) and a carry-in (cin),
+        and returns (cout, carry, sum_bit).
+        :param ignore: 1 drop cout, 2 drop carry, 3 drop both, LUT_4_2_CHOICE approximate compressor (LUT_4_2)
+        :param x1: bit
+        :param x2: bit
+        :param x3: bit
+        :param x4: bit
+        :param cin: carry-in bit
+        :return: (cout, carry, sum_bit)
+        """
+        # g4 is the XOR of x1 and x2
+        g4 = LogicGates.xor_gate(x1, x2)
+        # s is the sum from a partial full-adder
+        s = Compressor.full_adder_sum(g4, x3)
+        # cout is the carry-out from the partial full-adder
+        cout = Compressor.full_adder_cout(x1, x2, g4, x3)
+        # carry is an intermediate carry output
+        carry = Compressor.carry_output(s, x4, cin)
+        # sum_bit is the final sum output
+        sum_bit = Compressor.sum_output(s, x4, cin)
+        if ignore == 1:
+            cout = 0
+        if ignore == 2:
+            carry = 0
+        if ignore == 3:
+            cout = 0
+            carry = 0
+        if ignore == LUT_4_2_CHOICE:
+            if any(np.ndim(bit) for bit in (x1, x2, x3, x4, cin)):
+                # arrays of bits: look every operand pair up at once
+                index = x1 * 16 + x2 * 8 + x3 * 4 + x4 * 2 + cin
+                cout, carry, sum_bit = (column[index] for column in LUT_4_2_TABLE.T)
+            else:
+                cout, carry, sum_bit = LUT_4_2[(x1, x2, x3, x4, cin)]
+        return cout, carry, sum_bit
+
+
+# Adders of the 8-bit multiplier in evaluation order, with their inputs: partial product bits "a{i}_b{j}"
+# or outputs of earlier adders, "ha_1.sum"/"ha_1.carry" for half and full adders and
+# "ca_3.cout"/"ca_3.carry"/"ca_3.sum" for 4:2 compressors. The ids are the ones Find_best_approximation uses.
+NETWORK = [
+    ("ha_1", ("a1_b0", "a0_b1")),
+    ("fa_2", ("a2_b0", "a1_b1", "a0_b2")),
+    ("ca_3", ("a3_b0", "a2_b1", "a1_b2", "a0_b3", "fa_2.carry")),
+    ("ca_4", ("a4_b0", "a3_b1", "a2_b2", "a1_b3", "a0_b4")),
+    ("ca_5", ("a5_b0", "a4_b1", "a3_b2", "a2_b3", "a1_b4")),
+    ("ca_6", ("a6_b0", "a5_b1", "a4_b2", "a3_b3", "a2_b4")),
+    ("ca_7", ("a7_b0", "a6_b1", "a5_b2", "a4_b3", "a3_b4")),
+    ("ca_8", ("a7_b1", "a6_b2", "a5_b3", "a4_b4", "a3_b5")),
+    ("ca_9", ("a7_b2", "a6_b3", "a5_b4", "a4_b5", "a3_b6")),
+    ("ca_10", ("a7_b3", "a6_b4", "a5_b5", "a4_b6", "a3_b7")),
+    ("ca_11", ("a7_b4", "a6_b5", "a5_b6", "a4_b7", "ca_10.cout")),
+    ("ca_12", ("a7_b5", "a6_b6", "a5_b7", "ca_11.cout", "ca_11.carry")),
+    ("ha_13", ("fa_2.sum", "ha_1.carry")),
+    ("ha_14", ("ca_3.sum", "ha_13.carry")),
+    ("fa_15", ("ca_4.sum", "ca_3.cout", "ca_3.carry")),
+    ("ha_16", ("fa_15.sum", "ha_14.carry")),
+    ("ca_17", ("a0_b5", "ca_5.sum", "ca_4.cout", "ca_4.carry", "fa_15.carry")),
+    ("ha_18", ("ca_17.sum", "ha_16.carry")),
+    ("ca_19", ("a1_b5", "a0_b6", "ca_6.sum", "ca_5.carry", "ca_5.cout")),
+    ("fa_20", ("ca_19.sum", "ca_17.carry", "ca_17.cout")),
+    ("ha_21", ("fa_20.sum", "ha_18.carry")),
+    ("ca_22", ("a2_b5", "a1_b6", "a0_b7", "ca_7.sum", "ca_6.cout")),
+    ("ca_23", ("ca_22.sum", "ca_6.carry", "ca_19.cout", "ca_19.carry", "fa_20.carry")),
+    ("ha_24", ("ca_23.sum", "ha_21.carry")),
+    ("ca_25", ("a2_b6", "a1_b7", "ca_8.sum", "ca_7.carry", "ca_7.cout")),
+    ("ca_26", ("ca_25.sum", "ca_22.carry", "ca_22.cout", "ca_23.carry", "ca_23.cout")),
+    ("ha_27", ("ca_26.sum", "ha_24.carry")),
+    ("ca_28", ("a2_b7", "ca_9.sum", "ca_8.cout", "ca_8.carry", "ca_25.cout")),
+    ("ca_29", ("ca_28.sum", "ca_25.carry", "ca_26.cout", "ca_26.carry", "ha_27.carry")),
+    ("ca_30", ("ca_10.sum", "ca_9.carry", "ca_9.cout", "ca_28.carry", "ca_28.cout")),
+    ("fa_31", ("ca_30.sum", "ca_29.cout", "ca_29.carry")),
+    ("ca_32", ("ca_11.sum", "ca_10.carry", "ca_30.cout", "ca_30.carry", "fa_31.carry")),
+    ("fa_33", ("ca_12.sum", "ca_32.carry", "ca_32.cout")),
+    ("ca_34", ("a7_b6", "a6_b7", "ca_12.cout", "ca_12.carry", "fa_33.carry")),
+    ("fa_35", ("a7_b7", "ca_34.carry", "ca_34.cout")),
+]
+
+# signals of the 16 product bits, MSB first
+RESULT_BITS = [
+    "fa_35.carry", "fa_35.sum", "ca_34.sum", "fa_33.sum", "ca_32.sum", "fa_31.sum", "ca_29.sum", "ha_27.sum",
+    "ha_24.sum", "ha_21.sum", "ha_18.sum", "ha_16.sum", "ha_14.sum", "ha_13.sum", "ha_1.sum", "a0_b0",
+]
+
+OUTPUT_NAMES = {"ha": ("sum", "carry"), "fa": ("sum", "carry"), "ca": ("cout", "carry", "sum")}
+
+# per adder choice, as printed by Find_best_approximation:
+# ha/fa: 0 exact, 1 drop the carry; ca: 0 exact, 1 drop Cout, 2 drop Carry, 3 drop both.
+# A dropped output is forced to 0, the gate-level ignore= semantics of the old LUT_appro* scripts. This is not the
+# search engine's circuit (simulate_8bit_multiplier_py), whose dropped outputs come from its switch-level model and
+# are not constant 0, so even choices 1-3 give LUTs that differ from Multiplier.from_config on most operand pairs.
+# ca choice 4 of the search engine is its own approximate compressor, which this generator has no model of, so it is
+# rejected rather than read as LUT_4_2; LUT_4_2 has a choice of its own instead.
+LUT_4_2_CHOICE = 5
+SEARCH_APPROXIMATE_CHOICE = 4
+VALID_CHOICES = {"ha": (0, 1), "fa": (0, 1), "ca": (0, 1, 2, 3, LUT_4_2_CHOICE)}
+
+
+def _upstream_adders():
+    # every adder together with all adders its outputs depend on, in NETWORK order
+    upstream = {}
+    for adder_id, inputs in NETWORK:
+        adders = {adder_id}
+        for signal in inputs:
+            if "." in signal:
+                adders |= upstream[signal.split(".")[0]]
+        upstream[adder_id] = adders
+    order = [adder_id for adder_id, _ in NETWORK]
+    return {adder_id: tuple(sorted(adders, key=order.index)) for adder_id, adders in upstream.items()}
+
+
+UPSTREAM_ADDERS = _upstream_adders()
+
+
+def parse_config(text):
+    """
+    Parses a configuration dict as printed by Find_best_approximation, e.g. "{'ca_19': 3, 'ca_4': np.int64(4)}".
+    """
+    return {key: int(value) for key, value in ast.literal_eval(re.sub(r"np\.int64\((\d+)\)", r"\1", text)).items()}
+
+
+def validate_config(config):
+    network_ids = set(UPSTREAM_ADDERS)
+    for adder_id, choice in config.items():
+        if adder_id not in network_ids:
+            raise ValueError(f"Unknown adder: {adder_id}")
+        if adder_id.startswith("ca_") and choice == SEARCH_APPROXIMATE_CHOICE:
+            raise ValueError(f"Choice {choice} for {adder_id} is the approximate compressor of the search engine, "
+                             f"which this generator does not model; use {LUT_4_2_CHOICE} for LUT_4_2")
+        if choice not in VALID_CHOICES[adder_id.split("_")[0]]:
+            raise ValueError(f"Invalid choice for {adder_id}: {choice}")
+
+
+class LUTGenerator:
+    """
+    Builds signed 8-bit multiplication LUTs for any per-adder approximation config.
+    The operand grid and partial products are computed once, and the outputs of every adder are cached by
+    the choices of the adders they depend on, so a sweep over many configs only recomputes what differs.
+    """
+
+    def __init__(self, max_cache_entries=4096):
+        self.max_cache_entries = max_cache_entries
+        self._cache = {}
+
+        # all signed operand pairs, entry [a + 128, b + 128]
+        self.a, self.b = np.meshgrid(np.arange(-128, 128), np.arange(-128, 128), indexing="ij")
+        self.exact = self.a * self.b
+        self.sign = (self.a < 0) != (self.b < 0)
+
+        # magnitudes fit in 8 bits, -128 becomes 128
+        a_magnitude = np.abs(self.a).astype(np.uint8)
+        b_magnitude = np.abs(self.b).astype(np.uint8)
+        self.partial_result = {}
+        for bb in range(8):
+            for aa in range(8):
+                self.partial_result[f"a{aa}_b{bb}"] = ((a_magnitude >> aa) & 1) & ((b_magnitude >> bb) & 1)
+
+    def _signal(self, signal, config):
+        if "." not in signal:
+            return self.partial_result[signal]
+        adder_id, output = signal.split(".")
+        return self._adder_outputs(adder_id, config)[output]
+
+    def _adder_outputs(self, adder_id, config):
+        key = tuple((upstream_id, config.get(upstream_id, 0)) for upstream_id in UPSTREAM_ADDERS[adder_id])
+        outputs = self._cache.get(key)
+        if outputs is not None:
+            return outputs
+
+        adder_type = adder_id.split("_")[0]
+        inputs = [self._signal(signal, config) for signal in dict(NETWORK)[adder_id]]
+        ignore = config.get(adder_id, 0)
+        if adder_type == "ha":
+            values = Adder.half_adder(*inputs, ignore=ignore)
+        elif adder_type == "fa":
+            values = Adder.full_adder(*inputs, ignore=ignore)
+        else:
+            values = Compressor.compressor_4_to_2(*inputs, ignore=ignore)
+        outputs = dict(zip(OUTPUT_NAMES[adder_type], values))
+
+        if len(self._cache) >= self.max_cache_entries:
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = outputs
+        return outputs
+
+    def generate(self, config):
+        """
+        :param config: {adder_id: choice} as printed by Find_best_approximation, missing adders are exact
+        :return: int32 array of shape (256, 256), entry [a + 128, b + 128] holds the approximate product of a and b
+        """
+        validate_config(config)
+        magnitude = np.zeros(self.a.shape, dtype=np.int32)
+        # the MSB is not part of the magnitude, as in Multiplier.sign_binary_multiply
+        for i in range(1, 16):
+            magnitude += np.asarray(self._signal(RESULT_BITS[i], config), dtype=np.int32) << (15 - i)
+        return np.where(self.sign, -magnitude, magnitude)
+
+    def metrics(self, lut):
+        """
+        Error metrics (see simulate_8bit_multiplier_py.metrics) of a LUT over all operand pairs
+        except the corner case (a, b) = (-128, -128).
+        """
+        return lut_error_metrics(lut, exclude=((-128, -128),))
+
+    def sweep(self, configs):
+        """
+        Yields (config, lut, metrics) for every config, sharing the adders the configs have in common.
+        """
+        for config in configs:
+            lut = self.generate(config)
+            yield config, lut, self.metrics(lut)
+
+
+def generate_multiplication_lut(config, generator=None):
+    """
+    :return: int32 array of shape (256, 256), entry [a + 128, b + 128] holds the approximate product of a and b
+    """
+    return (generator or LUTGenerator()).generate(config)
+
+
+def generate_multiplication_lut_csv(config, output_file="multiplication_LUT.csv", generator=None, save_npy=True):
+    """
+    Generates a CSV file containing the multiplication results (product) for all pairs of
+    signed 8-bit integers in the range [-128, 127], except the corner case (a, b) = (-128, -128).
+    Calculates MAE, MSE, and MRED for the multiplication results.
+    :param config: {adder_id: choice} as printed by Find_best_approximation
+    :param output_file: name of the output CSV file
+    :param generator: LUTGenerator to share between calls
+    :param save_npy: also write the full table as int16 .npy next to the CSV (see lut_format)
+    """
+    generator = generator or LUTGenerator()
+    lut = generator.generate(config)
+    metrics = generator.metrics(lut)
+
+    # Skip corner case for demonstration purposes
+    keep = ~((generator.a == -128) & (generator.b == -128))
+    with open(output_file, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        # Write CSV header
+        writer.writerow(["A", "B", "Product"])
+        writer.writerows(zip(generator.a[keep].tolist(), generator.b[keep].tolist(), lut[keep].tolist()))
+    if save_npy:
+        lut_format.save_lut(os.path.splitext(output_file)[0] + ".npy", lut)
+
+    # Output results
+    print(f"LUT table has been written to {output_file}.")
+    print(f"Total calculations: {np.count_nonzero(keep)}")
+    print(f"Mean Absolute Error (MAE): {metrics['mae']}")
+    print(f"Mean Square Error (MSE): {metrics['mse']}")
+    print(f"Mean Relative Error Distance (MRED): {metrics['mred'] * 100}%")
+    print(f"Normalized Mean Error Distance (NMED): {metrics['nmed']}")
+    print(f"Error Rate: {metrics['error_rate']}, Bias: {metrics['bias']}")
+    print(f"Worst Case Error: {metrics['max_error']} at (a, b) = {tuple(metrics['worst_operands'].tolist())}")
+    return lut, metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate approximate multiplication LUTs from adder configs.")
+    parser.add_argument("configs", nargs="+",
+                        help="config dicts as printed by Find_best_approximation, e.g. \"{'ca_19': 3}\"")
+    parser.add_argument("--output", "-o", nargs="+", default=None,
+                        help="output CSV file per config (default: appro<i>_multiplication_LUT.csv)")
+    parser.add_argument("--stack", default=None,
+                        help="also write all LUTs into one stacked binary file, named after the CSVs")
+    args = parser.parse_args()
+
+    outputs = args.output or [f"appro{i}_multiplication_LUT.csv" for i in range(1, len(args.configs) + 1)]
+    if len(outputs) != len(args.configs):
+        parser.error("give one output file per config")
+    shared_generator = LUTGenerator()
+    stack, configs = {}, {}
+    for config_text, output in zip(args.configs, outputs):
+        name = os.path.splitext(os.path.basename(output))[0]
+        configs[name] = parse_config(config_text)
+        stack[name], _ = generate_multiplication_lut_csv(configs[name], output, shared_generator)
+    if args.stack is not None:
+        lut_format.save_lut_stack(args.stack, stack, {"configs": configs})
+        print(f"{len(stack)} LUTs have been written to {args.stack}")
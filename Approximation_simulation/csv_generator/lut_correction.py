@@ -0,0 +1,91 @@
+import argparse
+import os
+
+import numpy as np
+
+import lut_format
+
+# "Exact + correction" LUTs: the exact product plus a residual table (lut - a * b) stored with the smallest integer
+# type after dividing out the largest power of two all residuals share. Dropped carries only ever remove
+# power-of-two weights, so for the generated LUTs the residuals fit in int8/int16 at a fraction of the 128 KB table.
+# Sign-magnitude multipliers give +-U(|a|, |b|); such LUTs are folded onto the 129x129 grid of magnitudes 0..128.
+
+
+def encode_correction(lut):
+    """
+    :param lut: (256, 256) LUT, entry [a + 128, b + 128] holds the product of a and b
+    :return: {"residual": int8/int16 array, "shift": residual scale exponent, "folded": residual over magnitudes}
+    """
+    lut = np.asarray(lut, dtype=np.int32)
+    values = np.arange(-128, 128)
+    magnitude = np.abs(values)
+
+    unsigned = np.zeros((129, 129), dtype=np.int32)
+    unsigned[np.ix_(magnitude, magnitude)] = np.abs(lut)
+    residual = unsigned - np.multiply.outer(np.arange(129), np.arange(129))
+    folded = np.array_equal(decode_correction({"residual": residual, "shift": 0, "folded": True}), lut)
+    if not folded:
+        residual = lut - np.multiply.outer(values, values)
+
+    nonzero = residual[residual != 0]
+    shift = 0
+    if nonzero.size:
+        # trailing zero bits of the gcd
+        gcd = int(np.gcd.reduce(np.abs(nonzero)))
+        shift = (gcd & -gcd).bit_length() - 1
+    residual = residual >> shift
+
+    for dtype in (np.int8, np.int16, np.int32):
+        if np.iinfo(dtype).min <= residual.min() and residual.max() <= np.iinfo(dtype).max:
+            break
+    return {"residual": residual.astype(dtype), "shift": shift, "folded": folded}
+
+
+def correction_multiply(correction, a, b):
+    """
+    Vectorized lookup straight from the correction, without decoding the full table.
+    :param a: integer array in the range [-128, 127]
+    :param b: integer array in the range [-128, 127], broadcastable with a
+    :return: int32 array of products
+    """
+    a = np.asarray(a, dtype=np.int32)
+    b = np.asarray(b, dtype=np.int32)
+    residual = correction["residual"]
+    shift = int(correction["shift"])
+    if correction["folded"]:
+        a_magnitude = np.abs(a)
+        b_magnitude = np.abs(b)
+        unsigned = a_magnitude * b_magnitude + (residual[a_magnitude, b_magnitude].astype(np.int32) << shift)
+        return np.where((a < 0) != (b < 0), -unsigned, unsigned)
+    return a * b + (residual[a + 128, b + 128].astype(np.int32) << shift)
+
+
+def decode_correction(correction):
+    """
+    :return: the int16 (256, 256) LUT, entry [a + 128, b + 128]
+    """
+    a, b = np.meshgrid(np.arange(-128, 128), np.arange(-128, 128), indexing="ij")
+    return correction_multiply(correction, a, b).astype(np.int16)
+
+
+def save_correction(npz_file, correction):
+    np.savez(npz_file, residual=correction["residual"], shift=correction["shift"], folded=correction["folded"])
+
+
+def load_correction(npz_file):
+    with np.load(npz_file) as f:
+        return {"residual": f["residual"], "shift": int(f["shift"]), "folded": bool(f["folded"])}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encode LUTs as exact product plus compact correction (.npz).")
+    parser.add_argument("lut_files", nargs="+", help="LUT CSV, .npy or stacked files")
+    args = parser.parse_args()
+
+    for lut_file in args.lut_files:
+        lut = lut_format.load_any_lut(lut_file)
+        correction = encode_correction(lut)
+        npz_file = os.path.splitext(lut_file)[0] + ".npz"
+        save_correction(npz_file, correction)
+        print(f"{npz_file}: residual {correction['residual'].shape} {correction['residual'].dtype} "
+              f"<< {correction['shift']}, {correction['residual'].nbytes} bytes instead of {lut.nbytes}")
@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import warnings
+
+import numpy as np
+
+# Binary LUT formats, all tables are int16 of shape (256, 256) with entry [a + 128, b + 128] holding a * b.
+# A single LUT is a plain .npy file. A stacked file holds several LUTs: MAGIC, the header length as little-endian
+# uint32 and a JSON header, then the (K, 256, 256) tables starting on an ALIGNMENT boundary, so loaders can
+# memory-map them and every process shares one page-cached copy.
+MAGIC = b"LUTSTACK"
+ALIGNMENT = 64
+LUT_SHAPE = (256, 256)
+
+
+def to_int16(lut):
+    """
+    Checks a LUT against the format and converts it to int16.
+    """
+    lut = np.asarray(lut)
+    if lut.shape[-2:] != LUT_SHAPE:
+        raise ValueError(f"LUT must have shape {LUT_SHAPE}, got {lut.shape}")
+    if lut.size and (lut.min() < np.iinfo(np.int16).min or lut.max() > np.iinfo(np.int16).max):
+        raise ValueError("LUT values do not fit in int16")
+    return lut.astype(np.int16)
+
+
+def save_lut(npy_file, lut):
+    np.save(npy_file, to_int16(lut))
+
+
+def load_lut(npy_file):
+    """
+    :return: read-only memory-mapped int16 array of shape (256, 256)
+    """
+    return np.load(npy_file, mmap_mode="r")
+
+
+def load_lut_csv(csv_file):
+    """
+    Reads an A,B,Product CSV as written by LUT_generator into the int16 (256, 256) layout.
+    The CSVs skip the corner case (-128, -128), so they do not record the circuit's output there: missing pairs
+    are filled with the exact product and a warning is issued. The .npy written next to the CSV holds the full table.
+    """
+    a, b, product = np.loadtxt(csv_file, delimiter=",", skiprows=1, dtype=np.int64, ndmin=2).T
+    lut = np.multiply.outer(np.arange(-128, 128), np.arange(-128, 128))
+    lut[a + 128, b + 128] = product
+    present = np.zeros(LUT_SHAPE, dtype=bool)
+    present[a + 128, b + 128] = True
+    if not present.all():
+        missing = np.argwhere(~present) - 128
+        warnings.warn(f"{csv_file} misses {len(missing)} operand pair(s), e.g. {tuple(missing[0].tolist())}, "
+                      f"they hold the exact product instead of the circuit's output; load the .npy for the full LUT",
+                      stacklevel=2)
+    return to_int16(lut)
+
+
+def save_lut_stack(stack_file, luts, metadata=None):
+    """
+    :param luts: {name: LUT}, stored in this order
+    :param metadata: JSON-serializable dict stored in the header, e.g. the config of every LUT
+    """
+    names = list(luts)
+    tables = to_int16(np.stack([luts[name] for name in names]) if names else np.zeros((0,) + LUT_SHAPE))
+    header = json.dumps({
+        "names": names,
+        "shape": list(tables.shape),
+        "dtype": "<i2",
+        "metadata": metadata or {},
+    }).encode()
+    # pad the header with spaces so the tables start on an ALIGNMENT boundary
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % ALIGNMENT)
+
+    with open(stack_file, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint32(len(header)).astype("<u4").tobytes())
+        f.write(header)
+        f.write(tables.astype("<i2").tobytes())
+
+
+def read_lut_stack_header(stack_file):
+    """
+    :return: (header dict, byte offset of the tables)
+    """
+    with open(stack_file, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{stack_file} is not a stacked LUT file")
+        header_length = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+        header = json.loads(f.read(header_length))
+    return header, len(MAGIC) + 4 + header_length
+
+
+def load_lut_stack(stack_file):
+    """
+    :return: ({name: read-only memory-mapped int16 (256, 256) LUT}, metadata)
+    """
+    header, offset = read_lut_stack_header(stack_file)
+    shape = tuple(header["shape"])
+    if shape[0] == 0:
+        return {}, header["metadata"]
+    tables = np.memmap(stack_file, dtype=header["dtype"], mode="r", offset=offset, shape=shape)
+    return dict(zip(header["names"], tables)), header["metadata"]
+
+
+def load_any_lut(lut_file, name=None):
+    """
+    Loads one LUT from a .npy, a stacked or a CSV file; name selects the LUT of a stacked file (default: the first).
+    A CSV with the .npy of the generator next to it loads the .npy, which holds the pairs the CSV skips.
+    """
+    lut_file = os.fspath(lut_file)
+    if lut_file.endswith(".npy"):
+        return load_lut(lut_file)
+    if lut_file.endswith(".csv"):
+        npy_file = os.path.splitext(lut_file)[0] + ".npy"
+        return load_lut(npy_file) if os.path.exists(npy_file) else load_lut_csv(lut_file)
+    luts, _ = load_lut_stack(lut_file)
+    return luts[name] if name is not None else next(iter(luts.values()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert LUT CSV files to the binary LUT formats.")
+    parser.add_argument("csv_files", nargs="+", help="A,B,Product CSV files")
+    parser.add_argument("--stack", default=None,
+                        help="write one stacked file instead of a .npy per CSV, LUTs are named after the CSVs")
+    args = parser.parse_args()
+
+    converted = {}
+    for csv_file in args.csv_files:
+        name = os.path.splitext(os.path.basename(csv_file))[0]
+        converted[name] = load_lut_csv(csv_file)
+        if args.stack is None:
+            npy_file = os.path.splitext(csv_file)[0] + ".npy"
+            save_lut(npy_file, converted[name])
+            print(f"LUT has been written to {npy_file}")
+    if args.stack is not None:
+        save_lut_stack(args.stack, converted)
+        print(f"{len(converted)} LUTs have been written to {args.stack}")
@@ -1,8 +1,15 @@
-import copy
-from hyperopt import fmin, tpe, hp, STATUS_OK, Trials
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+
+import numpy as np
+from hyperopt import fmin, tpe, hp, space_eval, STATUS_OK, Trials
+from hyperopt.base import Domain, spec_from_misc, JOB_STATE_DONE, JOB_STATE_RUNNING
+from hyperopt.utils import coarse_utcnow
 
 from simulate_8bit_multiplier_py.core import Multiplier
-from simulate_8bit_multiplier_py.simulate_multiplier import evaluate
+from simulate_8bit_multiplier_py.simulate_multiplier import evaluate_with_status
 
 HA_NAMES = ["ha_1", "ha_13", "ha_14", "ha_16", "ha_18", "ha_21", "ha_24", "ha_27"]
 FA_NAMES = ["fa_2", "fa_15", "fa_20", "fa_31", "fa_33", "fa_35"]
@@ -12,48 +19,36 @@ CA_NAMES = [
 ]
 
 
-def reset_mul():
-    mul = Multiplier()
-    return mul
-
-
-def objective(params):
-    mul = reset_mul()
+# best score of this process, the bound multi-fidelity evaluation stops candidates against
+_best_score = None
 
-    idx = 0
 
-    for ha_name in HA_NAMES:
-        choice_val = params[idx]
-        if choice_val == 1:
-            mul.drop_adder_Carry_or_Cout(ha_name, "Cout")
-        idx += 1
+def reset_mul(config=None):
+    # clone of a cached exact multiplier with prebuilt adder variants plugged in
+    mul = Multiplier.from_config(config or {})
+    return mul
 
-    for fa_name in FA_NAMES:
-        choice_val = params[idx]
-        if choice_val == 1:
-            mul.drop_adder_Carry_or_Cout(fa_name, "Cout")
-        idx += 1
 
-    # 最后处理所有 CA
-    for ca_name in CA_NAMES:
-        choice_val = params[idx]  # 0,1,2,3
-        if choice_val == 1:
-            mul.drop_adder_Carry_or_Cout(ca_name, "Cout")
-        elif choice_val == 2:
-            mul.drop_adder_Carry_or_Cout(ca_name, "Carry")
-        elif choice_val == 3:
-            mul.drop_adder_Carry_or_Cout(ca_name, "Cout")
-            mul.drop_adder_Carry_or_Cout(ca_name, "Carry")
-        # else:
-        #     mul.convert_mode(ca_name)
-        idx += 1
+def objective(params, exhaustive=False, multi_fidelity=False, best_score=None):
+    # choice per adder, ha/fa: 0 keep, 1 drop Cout; ca: 0 keep, 1 drop Cout, 2 drop Carry, 3 drop both
+    # with multi_fidelity, candidates that cannot beat best_score (default: the best seen so far) stop early,
+    # their loss is then the bound they were stopped on and early_stopped is set
+    global _best_score
+    config = dict(zip(HA_NAMES + FA_NAMES + CA_NAMES, params))
+    mul = reset_mul(config)
 
-    evaluate_value = evaluate(mul)
+    if best_score is None:
+        best_score = _best_score
+    evaluate_value, early_stopped = evaluate_with_status(mul, exhaustive=exhaustive, multi_fidelity=multi_fidelity,
+                                                         best_score=best_score)
+    if not early_stopped and (_best_score is None or evaluate_value > _best_score):
+        _best_score = evaluate_value
 
     return {
         'loss': -evaluate_value,
         'status': STATUS_OK,
-        'evaluate_value': evaluate_value
+        'evaluate_value': evaluate_value,
+        'early_stopped': early_stopped
     }
 
 
@@ -75,10 +70,13 @@ for ca_name in CA_NAMES:
     )
 
 
-def run_bayesian_optimization(max_evals=100):
+def run_bayesian_optimization(max_evals=100, multi_fidelity=False):
+    global _best_score
+    # every run starts without a bound, nothing carries over from a previous run
+    _best_score = None
     trials = Trials()
     best = fmin(
-        fn=objective,
+        fn=partial(objective, multi_fidelity=multi_fidelity),
         space=search_space,
         algo=tpe.suggest,
         max_evals=max_evals,
@@ -87,6 +85,87 @@ def run_bayesian_optimization(max_evals=100):
     return best, trials
 
 
+def load_trials(trials_file=None):
+    """
+    File-backed trials store, unfinished trials of an interrupted run are dropped.
+    :return: (trials, state of the suggestion generator when the file was saved, or None)
+    """
+    if trials_file is None or not os.path.exists(trials_file):
+        return Trials(), None
+    with open(trials_file, "rb") as f:
+        saved = pickle.load(f)
+    # files written before the generator state was stored hold the bare trials
+    trials, rstate_state = (saved["trials"], saved["rstate"]) if isinstance(saved, dict) else (saved, None)
+    trials._dynamic_trials = [trial for trial in trials._dynamic_trials if trial["state"] == JOB_STATE_DONE]
+    trials.refresh()
+    return trials, rstate_state
+
+
+def save_trials(trials, trials_file=None, rstate=None):
+    # the generator state is stored with the trials, so a resumed run continues its sequence of suggestions
+    if trials_file is None:
+        return
+    temp_file = f"{trials_file}.tmp"
+    with open(temp_file, "wb") as f:
+        pickle.dump({"trials": trials, "rstate": rstate.bit_generator.state if rstate is not None else None}, f)
+    os.replace(temp_file, trials_file)
+
+
+def run_parallel_bayesian_optimization(max_evals=100, n_parallel=None, trials_file=None, seed=42, exhaustive=True,
+                                       multi_fidelity=False):
+    """
+    Asynchronous TPE: keeps n_parallel trials in flight on a local process pool. Whenever slots free up,
+    one batch of suggestions is drawn for all of them from the trials finished so far.
+    With trials_file the trials are saved after every finished trial and a rerun resumes from them.
+    Workers score with the exhaustive bit-sliced engine by default, so they do not start pools of their own.
+    With multi_fidelity every trial is stopped early against the best score finished when it was submitted.
+    """
+    trials, rstate_state = load_trials(trials_file)
+    domain = Domain(objective, search_space)
+    rstate = np.random.default_rng(seed)
+    if rstate_state is not None:
+        rstate.bit_generator.state = rstate_state
+    elif trials.trials:
+        # resumed from a file without generator state: do not replay the suggestions of the first run
+        rstate = np.random.default_rng((seed, len(trials.trials)))
+    fn = partial(objective, exhaustive=exhaustive, multi_fidelity=multi_fidelity)
+
+    with ProcessPoolExecutor(n_parallel) as executor:
+        n_parallel = executor._max_workers
+        running = {}
+        while True:
+            free = min(n_parallel - len(running), max_evals - len(trials.trials))
+            if free > 0:
+                new_ids = trials.new_trial_ids(free)
+                trials.refresh()
+                trials.insert_trial_docs(tpe.suggest(new_ids, domain, trials, rstate.integers(2 ** 31 - 1)))
+                trials.refresh()
+                losses = [loss for loss in trials.losses() if loss is not None]
+                best_score = -min(losses) if losses else None
+                for trial in trials.trials:
+                    if trial["tid"] in new_ids:
+                        params = space_eval(search_space, spec_from_misc(trial["misc"]))
+                        trial["state"] = JOB_STATE_RUNNING
+                        running[executor.submit(fn, params, best_score=best_score)] = trial
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial = running.pop(future)
+                trial["result"] = future.result()
+                trial["state"] = JOB_STATE_DONE
+                trial["refresh_time"] = coarse_utcnow()
+            trials.refresh()
+            save_trials(trials, trials_file, rstate)
+
+    return trials.argmin, trials
+
+
 if __name__ == "__main__":
     best_params, all_trials = run_bayesian_optimization(max_evals=60)
+    # spend the budget on promising candidates: stop the others after a small subset of operand pairs
+    # best_params, all_trials = run_bayesian_optimization(max_evals=60, multi_fidelity=True)
+    # many-core box: keep a batch of trials in flight, resumable from trials.pkl
+    # best_params, all_trials = run_parallel_bayesian_optimization(max_evals=60, trials_file="trials.pkl")
     print(best_params)
@@ -1,35 +1,152 @@
+import argparse
+import os
+import sys
+
 import numpy as np
-import pandas as pd
-
-data = pd.read_csv('/sign/LUT/appro1_multiplication_LUT.csv')
-
-lut = np.zeros((256, 256), dtype=np.int16)
-
-for index, row in data.iterrows():
-    a = int(row['A'])
-    b = int(row['B'])
-    product = int(row['Product'])
-    if -128 <= a <= -1:
-        a += 256
-    if -128 <= b <= -1:
-        b += 256
-    lut[a, b] = product
-print(lut)
-
-output_file = "appro1.h"
-with open(output_file, 'w') as f:
-    f.write('#include <stdint.h>\n\n')
-    f.write('const int16_t lut[256][256] = {\n')
-
-    for i, row in enumerate(lut):
-        row_data = ', '.join(map(str, row))
-        if i < 255:
-            f.write(f'    {{{row_data}}},\n')
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "Approximation_simulation", "csv_generator"))
+
+from lut_correction import encode_correction  # noqa: E402
+from lut_format import load_any_lut, load_lut_stack  # noqa: E402
+
+DEFAULT_INPUTS = [
+    os.path.join(SCRIPT_DIR, "..", "Approximation_simulation", "csv", f"{name}_multiplication_LUT.csv")
+    for name in ("exact", "appro1", "appro2", "appro3")
+]
+
+
+def to_twos_complement(lut):
+    """
+    Moves a LUT of the generators (entry [a + 128, b + 128]) to the two's complement layout of the C headers:
+    entry [a & 0xFF, b & 0xFF] holds a * b.
+    """
+    # moving -128..-1 behind 0..127 turns [a + 128] into [a & 0xFF]
+    return np.roll(lut, 128, axis=(0, 1)).astype(np.int16)
+
+
+def load_lut(lut_file, name=None):
+    """
+    Loads a LUT in the two's complement layout of the C headers, see to_twos_complement.
+    Accepts the A,B,Product CSVs, the int16 .npy files or the stacked files of the LUT generators
+    (see lut_format.py); name selects the LUT of a stacked file.
+    """
+    return to_twos_complement(load_any_lut(lut_file, name))
+
+
+def load_luts(lut_file):
+    """
+    :return: {header file name: LUT in the two's complement layout}, one entry per LUT of a stacked file
+    """
+    lut_file = os.fspath(lut_file)
+    if lut_file.endswith((".npy", ".csv")):
+        return {header_name(lut_file): load_lut(lut_file)}
+    luts, _ = load_lut_stack(lut_file)
+    return {header_name(name): to_twos_complement(lut) for name, lut in luts.items()}
+
+
+def format_rows(values, row_length=256):
+    rows = np.asarray(values).reshape(-1, row_length).tolist()
+    return ",\n".join("    {" + ", ".join(map(str, row)) + "}" for row in rows)
+
+
+def format_flat(values, row_length=256):
+    values = np.asarray(values).tolist()
+    return ",\n".join("    " + ", ".join(map(str, values[i:i + row_length])) for i in range(0, len(values), row_length))
+
+
+def is_symmetric(lut):
+    return np.array_equal(lut, lut.T)
+
+
+def symmetric_half(lut):
+    """
+    Upper triangle (a <= b as uint8) of a symmetric LUT, row by row: 256 * 257 / 2 entries.
+    """
+    if not is_symmetric(lut):
+        raise ValueError("LUT is not symmetric, use the full or flat layout")
+    return lut[np.triu_indices(256)]
+
+
+def write_header(lut, output_file, layout="full", name="lut"):
+    """
+    :param layout: "full" const int16_t name[256][256], indexed [(uint8_t)a][(uint8_t)b];
+                   "flat" const int16_t name[65536], indexed [(uint8_t)a << 8 | (uint8_t)b];
+                   "half" const int16_t name[32896], the upper triangle of a symmetric LUT;
+                   "correction" the exact product plus a small name_residual table (see lut_correction.py).
+                   flat, half and correction come with a name_lookup(a, b) helper.
+    """
+    parts = ['#include <stdint.h>\n\n']
+    if layout == "full":
+        parts.append(f'const int16_t {name}[256][256] = {{\n{format_rows(lut)}\n}};\n\n')
+    elif layout == "flat":
+        parts.append(f'const int16_t {name}[65536] = {{\n{format_flat(lut.ravel())}\n}};\n\n')
+        parts.append(f'static inline int16_t {name}_lookup(int8_t a, int8_t b) {{\n'
+                     f'    return {name}[(uint8_t)a << 8 | (uint8_t)b];\n'
+                     f'}}\n')
+    elif layout == "half":
+        half = symmetric_half(lut)
+        parts.append(f'const int16_t {name}[{half.size}] = {{\n{format_flat(half)}\n}};\n\n')
+        parts.append(f'static inline int16_t {name}_lookup(int8_t a, int8_t b) {{\n'
+                     f'    uint16_t i = (uint8_t)a, j = (uint8_t)b;\n'
+                     f'    if (i > j) {{ uint16_t t = i; i = j; j = t; }}\n'
+                     f'    /* row i of the upper triangle starts after 256 + 255 + ... + (257 - i) entries */\n'
+                     f'    return {name}[i * 256 - i * (i - 1) / 2 + (j - i)];\n'
+                     f'}}\n')
+    elif layout == "correction":
+        # encode_correction works on the [a + 128] layout
+        correction = encode_correction(np.roll(lut, 128, axis=(0, 1)))
+        residual = correction["residual"]
+        c_type = f"{residual.dtype}_t"
+        size = residual.shape[0]
+        parts.append(f'#define {name.upper()}_SCALE {1 << correction["shift"]}\n\n')
+        parts.append(f'const {c_type} {name}_residual[{size}][{size}] = {{\n{format_rows(residual, size)}\n}};\n\n')
+        parts.append(f'static inline int16_t {name}_lookup(int8_t a, int8_t b) {{\n')
+        if correction["folded"]:
+            parts.append(f'    /* sign-magnitude: residual over |a|, |b| in 0..128 */\n'
+                         f'    uint8_t i = a < 0 ? (uint8_t)(-a) : (uint8_t)a;\n'
+                         f'    uint8_t j = b < 0 ? (uint8_t)(-b) : (uint8_t)b;\n'
+                         f'    int32_t m = (int32_t)i * j + (int32_t){name}_residual[i][j] * {name.upper()}_SCALE;\n'
+                         f'    return (int16_t)((a < 0) != (b < 0) ? -m : m);\n')
         else:
-            f.write(f'    {{{row_data}}}\n')
+            parts.append(f'    return (int16_t)((int32_t)a * b + (int32_t){name}_residual[a + 128][b + 128] * '
+                         f'{name.upper()}_SCALE);\n')
+        parts.append('}\n')
+    else:
+        raise ValueError(f"Unknown layout: {layout}")
+
+    with open(output_file, 'w') as f:
+        f.write("".join(parts))
+
+
+def header_name(lut_file):
+    # exact_multiplication_LUT.csv -> exact.h, also used for the LUT names of stacked files
+    base = os.path.splitext(os.path.basename(lut_file))[0]
+    return base.replace("_multiplication_LUT", "") + ".h"
 
-    f.write('};\n\n')
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert multiplication LUTs into C headers.")
+    parser.add_argument("lut_files", nargs="*", default=DEFAULT_INPUTS,
+                        help="LUT CSV, .npy or stacked files, a stacked file gives one header per LUT "
+                             "(default: exact and appro1..3 from Approximation_simulation/csv)")
+    parser.add_argument("--layout", choices=("full", "flat", "half", "correction"), default="full")
+    parser.add_argument("--name", default="lut", help="name of the C array")
+    parser.add_argument("--output-dir", default=SCRIPT_DIR)
+    args = parser.parse_args()
 
-print(f"LUT has been written to {output_file}")
+    headers = {}
+    for lut_file in args.lut_files:
+        headers.update(load_luts(lut_file))
+    # check every input before writing anything, so a failing run leaves no partial set of headers
+    if args.layout == "half":
+        asymmetric = [header for header, lut in headers.items() if not is_symmetric(lut)]
+        if asymmetric:
+            parser.error(f"the half layout needs symmetric LUTs, use the full or flat layout for: "
+                         f"{', '.join(asymmetric)}")
 
+    os.makedirs(args.output_dir, exist_ok=True)
+    for header, lut in headers.items():
+        output_file = os.path.join(args.output_dir, header)
+        write_header(lut, output_file, args.layout, args.name)
+        print(f"LUT has been written to {output_file}")
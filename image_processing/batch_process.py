@@ -0,0 +1,128 @@
+import argparse
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageSequence
+from tqdm import tqdm
+
+from image_processing import KERNELS, LUTImageProcessor, bounded_map
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".gif", ".webp")
+
+_END = object()
+
+
+def iter_directory(directory):
+    """
+    :return: Generator of (name, image file path) for the images of a directory, sorted by file name.
+             The files are decoded by the workers.
+    """
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.lower().endswith(IMAGE_EXTENSIONS):
+            yield os.path.splitext(file_name)[0], os.path.join(directory, file_name)
+
+
+def iter_frames(path):
+    """
+    Frames of a frame sequence: a (N, H, W, 3) uint8 .npy file (memory-mapped) or a multi-frame image (GIF, TIFF).
+    Frames of one file can only be decoded in order, so this runs on the reader thread.
+
+    :return: Generator of (name, uint8 RGB array (H, W, 3)).
+    """
+    if path.endswith(".npy"):
+        for index, frame in enumerate(np.load(path, mmap_mode="r")):
+            yield f"frame_{index:06d}", np.asarray(frame)
+    else:
+        with Image.open(path) as image:
+            for index, frame in enumerate(ImageSequence.Iterator(image)):
+                yield f"frame_{index:06d}", np.asarray(frame.convert("RGB"))
+
+
+def prefetch(iterable, size):
+    """
+    Run an iterable on a background thread into a bounded queue, so producing items (reading, decoding)
+    overlaps with consuming them and never runs more than size items ahead.
+    """
+    items = queue.Queue(maxsize=size)
+    errors = []
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            items.put(_END)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is _END:
+            break
+        yield item
+    if errors:
+        raise errors[0]
+
+
+def process_frame(processor, kernel, source, output_file):
+    """
+    Decode, scale_to_int8, LUT filter and encode one image.
+
+    :param source: An image file path or an uint8 RGB array.
+    :return: output_file
+    """
+    if isinstance(source, str):
+        with Image.open(source) as image:
+            source = np.asarray(image.convert("RGB"))
+    filtered = processor.sharpen_color_image(processor.scale_to_int8(source), kernel)
+    Image.fromarray((filtered + 128).clip(0, 255).astype(np.uint8)).save(output_file)
+    return output_file
+
+
+def process_batch(processor, sources, output_dir, kernel, workers=None, queue_size=None):
+    """
+    Push a stream of images through the LUT filter. The sources are read ahead on a bounded queue and the
+    frames are decoded, filtered and encoded on a thread pool, with a bounded number of frames in flight.
+
+    :param sources: Iterable of (name, image file path or uint8 RGB array), e.g. iter_directory or iter_frames.
+    :param output_dir: Directory of the filtered PNGs, one per source named after it.
+    :param workers: Number of worker threads, default os.cpu_count().
+    :param queue_size: Frames read ahead and frames in flight, default 2 * workers.
+    :return: Generator of the written file paths, in source order.
+    """
+    if processor.lut.ndim != 2:
+        # a LUT stack filters every frame into K images, one PNG per source cannot hold them
+        raise ValueError(f"process_batch needs a single LUT, the processor holds a stack of {len(processor.lut)}")
+    workers = workers or os.cpu_count() or 1
+    queue_size = queue_size or 2 * workers
+    os.makedirs(output_dir, exist_ok=True)
+
+    tasks = ((name, (processor, kernel, source, os.path.join(output_dir, f"{name}.png")))
+             for name, source in prefetch(sources, queue_size))
+    with ThreadPoolExecutor(workers) as executor:
+        for _, output_file in bounded_map(executor, process_frame, tasks, queue_size):
+            yield output_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filter a directory of images or a frame sequence with a LUT.")
+    parser.add_argument("input", help="directory of images, a (N, H, W, 3) uint8 .npy file or a multi-frame image")
+    parser.add_argument("output_dir")
+    parser.add_argument("--lut", default="LUT/appro1_multiplication_LUT.csv", help="LUT CSV, .npy or .npz file")
+    parser.add_argument("--kernel", choices=tuple(KERNELS), default="sharpen")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=None)
+    args = parser.parse_args()
+
+    lut_processor = LUTImageProcessor(args.lut)
+    if lut_processor.lut.ndim != 2:
+        parser.error(f"{args.lut} is a stacked file of {len(lut_processor.lut)} LUTs, give a single LUT")
+    frames = iter_directory(args.input) if os.path.isdir(args.input) else iter_frames(args.input)
+    written = process_batch(lut_processor, frames, args.output_dir, KERNELS[args.kernel], args.workers,
+                            args.queue_size)
+    count = sum(1 for _ in tqdm(written, unit="frame"))
+    print(f"{count} images have been written to {args.output_dir}")
@@ -0,0 +1,151 @@
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+from PIL import Image
+from skimage import data
+from skimage.metrics import structural_similarity
+from skimage.transform import resize
+
+from image_processing import KERNELS, LUT_DIR, LUTImageProcessor
+
+REFERENCE_LUT = os.path.join(LUT_DIR, "exact_multiplication_LUT.csv")
+DEFAULT_LUTS = [os.path.join(LUT_DIR, f"{name}_multiplication_LUT.csv") for name in ("appro1", "appro2", "appro3")]
+DEFAULT_IMAGES = ("astronaut", "rocket", "coffee")
+
+# operation name -> function of (processor, image in [-128, 127], second image of the same shape for blending)
+OPERATIONS = {
+    "sharpen": lambda processor, image, other: processor.sharpen_color_image(image, KERNELS["sharpen"]),
+    "edge": lambda processor, image, other: processor.sharpen_color_image(image, KERNELS["edge"]),
+    "blend": lambda processor, image, other: processor.blend_images_lut(image, other, 0.5),
+}
+
+RESULT_FIELDS = ("image", "operation", "lut", "pixels", "seconds", "pixels_per_second",
+                 "psnr", "ssim", "med", "error_rate", "max_error")
+
+
+def psnr(result, reference, data_range=255):
+    """
+    Peak signal-to-noise ratio in dB, inf for identical images.
+    """
+    mse = np.mean(np.square(np.asarray(result, dtype=np.float64) - reference))
+    return float("inf") if mse == 0 else float(10 * np.log10(data_range ** 2 / mse))
+
+
+def ssim(result, reference, data_range=255):
+    """
+    Mean structural similarity, over the channels of (H, W, C) images.
+    """
+    result = np.asarray(result, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    return float(structural_similarity(result, reference, data_range=data_range,
+                                       channel_axis=-1 if result.ndim == 3 else None))
+
+
+def load_images(sources):
+    """
+    :param sources: names of skimage.data samples or image file paths
+    :return: {name: uint8 RGB array (H, W, 3)}
+    """
+    images = {}
+    for source in sources:
+        if os.path.isfile(source):
+            images[os.path.basename(source)] = np.asarray(Image.open(source).convert("RGB"))
+        else:
+            image = getattr(data, source)()
+            images[source] = np.asarray(Image.fromarray(image).convert("RGB"))
+    return images
+
+
+def timed(operation, processor, image, other, repeats):
+    # best wall time of repeats runs
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = operation(processor, image, other)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def run_benchmark(lut_files, images, operations=tuple(OPERATIONS), reference_file=REFERENCE_LUT, repeats=1):
+    """
+    Runs every operation on every image with every LUT and compares the outputs against the reference LUT's.
+    Blending mixes each image with the next one, resized to its shape.
+
+    :param lut_files: LUT files to benchmark, see LUTImageProcessor
+    :param images: {name: uint8 RGB array}
+    :param operations: names of OPERATIONS
+    :param reference_file: LUT of the reference outputs, default the exact multiplier
+    :param repeats: timing runs per measurement, the best one is reported
+    :return: list of dicts with the RESULT_FIELDS, the reference LUT included
+    """
+    reference_processor = LUTImageProcessor(reference_file)
+    processors = [LUTImageProcessor(lut_file) for lut_file in lut_files]
+    names = list(images)
+    rows = []
+
+    for position, name in enumerate(names):
+        image = reference_processor.scale_to_int8(images[name])
+        other = images[names[(position + 1) % len(names)]]
+        other = (resize(other, image.shape[:2], anti_aliasing=True) * 255).astype(np.uint8)
+        other = reference_processor.scale_to_int8(other)
+
+        for operation_name in operations:
+            operation = OPERATIONS[operation_name]
+            reference, _ = timed(operation, reference_processor, image, other, 1)
+            # compare in the display range [0, 255], like the saved images
+            reference_disp = (reference.astype(np.int32) + 128).clip(0, 255)
+
+            for processor in [reference_processor] + processors:
+                result, seconds = timed(operation, processor, image, other, repeats)
+                result_disp = (result.astype(np.int32) + 128).clip(0, 255)
+                metrics = processor.output_error_metrics(result_disp, reference_disp)
+                rows.append({
+                    "image": name,
+                    "operation": operation_name,
+                    "lut": os.path.basename(processor.lut_file),
+                    "pixels": image.shape[0] * image.shape[1],
+                    "seconds": seconds,
+                    "pixels_per_second": image.shape[0] * image.shape[1] / seconds,
+                    "psnr": psnr(result_disp, reference_disp),
+                    "ssim": ssim(result_disp, reference_disp),
+                    "med": float(metrics["mae"]),
+                    "error_rate": float(metrics["error_rate"]),
+                    "max_error": int(metrics["max_error"]),
+                })
+    return rows
+
+
+def write_results(rows, output_file):
+    with open(output_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def format_results(rows):
+    lines = [f"{'image':<12}{'operation':<10}{'lut':<32}{'ms':>9}{'Mpx/s':>9}{'PSNR':>9}{'SSIM':>8}{'MED':>9}"]
+    for row in rows:
+        lines.append(f"{row['image']:<12}{row['operation']:<10}{row['lut']:<32}{row['seconds'] * 1e3:>9.2f}"
+                     f"{row['pixels_per_second'] / 1e6:>9.2f}{row['psnr']:>9.2f}{row['ssim']:>8.4f}{row['med']:>9.4f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark image quality and speed of approximate multiplier LUTs.")
+    parser.add_argument("lut_files", nargs="*", default=DEFAULT_LUTS,
+                        help="LUT CSV, .npy or .npz files (default: appro1..3 from Approximation_simulation/csv)")
+    parser.add_argument("--reference", default=REFERENCE_LUT, help="LUT of the reference outputs")
+    parser.add_argument("--images", nargs="+", default=list(DEFAULT_IMAGES),
+                        help="skimage.data sample names or image files")
+    parser.add_argument("--operations", nargs="+", choices=tuple(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument("--repeats", type=int, default=3, help="timing runs per measurement, the best one is kept")
+    parser.add_argument("-o", "--output", default="benchmark_results.csv")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.lut_files, load_images(args.images), args.operations, args.reference, args.repeats)
+    write_results(results, args.output)
+    print(format_results(results))
+    print(f"Results have been written to {args.output}")
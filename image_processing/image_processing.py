@@ -1,4 +1,10 @@
 import csv
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
 import numpy as np
 import matplotlib.pyplot as plt
 from skimage import data, color
@@ -6,6 +12,75 @@ from skimage.transform import resize
 from tqdm import tqdm
 
 from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Approximate"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Approximation_simulation",
+                                "csv_generator"))
+from simulate_8bit_multiplier_py.metrics import error_metrics  # noqa: E402
+from lut_correction import decode_correction, load_correction  # noqa: E402
+from lut_format import load_any_lut, load_lut_stack  # noqa: E402
+
+# multiplication LUTs of the repo, written by Approximation_simulation/csv_generator
+LUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Approximation_simulation", "csv")
+
+# named kernels of the headless entry points (benchmark.py, batch_process.py) and filter banks
+KERNELS = {
+    "sharpen": np.array([
+        [-1, -1, -1],
+        [-1, 9, -1],
+        [-1, -1, -1]
+    ], dtype=np.int16),
+    "sobel_x": np.array([
+        [-1, 0, 1],
+        [-2, 0, 2],
+        [-1, 0, 1]
+    ], dtype=np.int16),
+    "sobel_y": np.array([
+        [-1, -2, -1],
+        [0, 0, 0],
+        [1, 2, 1]
+    ], dtype=np.int16),
+    "laplacian": np.array([
+        [0, 1, 0],
+        [1, -4, 1],
+        [0, 1, 0]
+    ], dtype=np.int16),
+}
+# the edge detection of the demos is the vertical Sobel kernel
+KERNELS["edge"] = KERNELS["sobel_y"]
+
+# edge length of the square tiles of filter_image_tiled, halo excluded
+DEFAULT_TILE_SIZE = 256
+
+# processors of the process pool workers, one per LUT file
+_worker_processors = {}
+
+
+def _convolve_tile(lut_file, padded_tile, kernel):
+    processor = _worker_processors.get(lut_file)
+    if processor is None:
+        processor = _worker_processors[lut_file] = LUTImageProcessor(lut_file)
+    return processor.convolve_padded(padded_tile, kernel)
+
+
+def bounded_map(executor, function, tasks, max_pending):
+    """
+    Like executor.map over (key, args) tasks, but with at most max_pending tasks submitted at a time,
+    so tasks are only produced (and their results held) as fast as they are consumed.
+
+    :return: Generator of (key, result) in task order.
+    """
+    pending = deque()
+    for key, args in tasks:
+        pending.append((key, executor.submit(function, *args)))
+        if len(pending) >= max_pending:
+            key, future = pending.popleft()
+            yield key, future.result()
+    while pending:
+        key, future = pending.popleft()
+        yield key, future.result()
+
+
 class LUTImageProcessor:
     """
     A class that demonstrates how to perform image processing operations
@@ -15,44 +90,54 @@ class LUTImageProcessor:
 
     def __init__(self, lut_file="exact_multiplication_LUT.csv"):
         """
-        Initialize the LUTImageProcessor with a path to the CSV file
+        Initialize the LUTImageProcessor with a path to the file
         containing the multiplication LUT (look-up table).
 
-        :param lut_file: The CSV file path containing the LUT data.
+        :param lut_file: The LUT file path: a CSV, the binary int16 .npy written by the LUT generators,
+                         a stacked LUT file (see lut_format.py next to the generators),
+                         or an exact + correction .npz (see lut_correction.py next to the generators).
+                         A stacked file, or a list of K LUT files, loads them as one (K, 256, 256) stack: every
+                         filter then computes the K outputs in one pass and returns them along a new leading axis.
         """
-        self.lut_file = lut_file
-        self.lut_dict = self.load_lut(lut_file)
-
-    def load_lut(self, csv_file):
+        if isinstance(lut_file, (list, tuple)):
+            self.lut_file = tuple(lut_file)
+            self.lut = np.concatenate([np.reshape(self.load_lut(f), (-1, 256, 256)) for f in lut_file])
+        else:
+            self.lut_file = lut_file
+            self.lut = self.load_lut(lut_file)
+
+    def load_lut(self, lut_file):
         """
-        Load the integer multiplication LUT from a CSV file.
+        Load the integer multiplication LUT from a .npy, .npz, CSV or stacked LUT file.
 
+        The .npy file is memory-mapped, so loading is instant and processes share one page-cached copy.
+        The .npz file holds an exact + correction LUT, see lut_correction.py.
         The CSV is expected to have 3 columns: a, b, product.
         where -128 <= a, b <= 127 and product = a*b, also in the range [-128, 127].
+        The pair (-128, -128) skipped by the CSVs is read from the .npy next to the CSV, see lut_format.load_any_lut.
 
-        :param csv_file: The path to the LUT CSV file.
-        :return: A dictionary mapping (a, b) -> product.
+        :param lut_file: The path to the LUT file, a str or os.PathLike.
+        :return: An int16 array of shape (256, 256), entry [a + 128, b + 128] holds the product of a and b,
+                 or (K, 256, 256) for a stacked file.
         """
-        lut_dict = {}
-        with open(csv_file, 'r') as f:
-            # Skip header if any
-            next(f)
-            for line in f:
-                a_str, b_str, product_str = line.strip().split(',')
-                a, b, product = int(a_str), int(b_str), int(product_str)
-                lut_dict[(a, b)] = product
-        return lut_dict
+        lut_file = os.fspath(lut_file)
+        if lut_file.endswith(".npz"):
+            return decode_correction(load_correction(lut_file))
+        if lut_file.endswith((".npy", ".csv")):
+            return load_any_lut(lut_file)
+        luts, _ = load_lut_stack(lut_file)
+        return np.stack(list(luts.values()))
 
     def lut_multiply(self, a, b):
         """
-        Multiply two integers using the loaded LUT dictionary.
+        Multiply two integers using the loaded LUT.
         Assumes a and b are already clipped to [-128, 127].
 
         :param a: An integer in the range [-128, 127].
         :param b: An integer in the range [-128, 127].
-        :return: The product as specified by the LUT dictionary (also in [-128, 127]).
+        :return: The product as specified by the LUT (also in [-128, 127]).
         """
-        return self.lut_dict[(a, b)]
+        return int(self.lut[a + 128, b + 128])
 
     def scale_to_int8(self, image):
         """
@@ -69,11 +154,39 @@ class LUTImageProcessor:
         img_scaled = img_norm * 255 - 128  # Shift to [-128, 127]
         return img_scaled.astype(np.int16)
 
+    def coefficient_columns(self, kernels):
+        """
+        Group the taps of a bank of kernels by their coefficient, clipped to [-128, 127].
+        The LUT column of a coefficient holds its product with every pixel value, so each multiply
+        becomes a gather from a 256-entry table. Columns that are all zero are left out.
+
+        :param kernels: A list of 2D numpy arrays, each centred in the window of the largest height and width.
+        :return: A list of (int32 column indexed by pixel + 128, list of (kernel number, ki, kj) window taps).
+                 For a LUT stack the columns are (256, K), so one gather fetches the products of all K LUTs.
+        """
+        kh = max(kernel.shape[0] for kernel in kernels)
+        kw = max(kernel.shape[1] for kernel in kernels)
+        taps = {}
+        for f, kernel in enumerate(kernels):
+            # same alignment as the kh // 2, kw // 2 padding of a kernel on its own
+            offset_i = kh // 2 - kernel.shape[0] // 2
+            offset_j = kw // 2 - kernel.shape[1] // 2
+            for (ki, kj), coefficient in np.ndenumerate(np.clip(kernel, -128, 127)):
+                taps.setdefault(int(coefficient), []).append((f, ki + offset_i, kj + offset_j))
+
+        lut = np.asarray(self.lut)
+        columns = []
+        for coefficient in sorted(taps):
+            column = np.moveaxis(lut[..., coefficient + 128], -1, 0).astype(np.int32)
+            if column.any():
+                columns.append((column, taps[coefficient]))
+        return columns
+
     def convolve_2d_lut(self, image_int8, kernel):
         """
         Perform 2D convolution on a single-channel image using the LUT-based multiplication.
-        Zero-padding is used. The multiplication is looked up from the LUT, and additions
-        are done in regular integer arithmetic.
+        Zero-padding is used. The products of every distinct kernel coefficient are gathered once over
+        the padded image from its LUT column, and additions of the shifted tap views are done in int32.
 
         :param image_int8: A 2D numpy array (H, W) in the range [-128, 127] (dtype int16).
         :param kernel: A 2D numpy array (kh, kw) (the convolution kernel).
@@ -87,34 +200,236 @@ class LUTImageProcessor:
         pad_w = kw // 2
 
         # Zero-padding
-        padded = np.zeros((h + 2 * pad_h, w + 2 * pad_w), dtype=np.int16)
+        padded = np.zeros((h + kh - 1, w + kw - 1), dtype=np.int16)
         padded[pad_h:pad_h + h, pad_w:pad_w + w] = image_int8
 
-        out = np.zeros((h, w), dtype=np.int16)
+        return self.convolve_padded(padded, kernel)
 
-        for i in range(h):
-            for j in range(w):
-                val = 0
-                # Convolution sum
-                for ki in range(kh):
-                    for kj in range(kw):
-                        k_val = kernel[ki, kj]
-                        px_val = padded[i + ki, j + kj]
+    def convolve_padded(self, padded, kernel):
+        """
+        The LUT-based convolution of an already padded single-channel image (or halo-padded tile).
 
-                        # Clip both kernel value and pixel value to [-128, 127]
-                        px_val = max(min(px_val, 127), -128)
-                        k_val = max(min(k_val, 127), -128)
+        :param padded: A 2D numpy array (H + kh - 1, W + kw - 1).
+        :param kernel: A 2D numpy array (kh, kw).
+        :return: The convolution result (H, W), or (K, H, W) for a LUT stack, dtype int16, clipped to [-128, 127].
+        """
+        acc = self.accumulate_padded(padded, [kernel])[0]
 
-                        # LUT multiplication
-                        prod = self.lut_multiply(px_val, k_val)
-                        val += prod
+        # Clip final sum to [-128, 127]
+        return np.moveaxis(np.clip(acc, -128, 127).astype(np.int16), range(2, acc.ndim), range(acc.ndim - 2))
 
-                # Clip final sum to [-128, 127]
-                val = max(min(val, 127), -128)
-                out[i, j] = val
+    def accumulate_padded(self, padded, kernels):
+        """
+        The unclipped LUT-based convolution sums of a bank of kernels, in one traversal of the padded image:
+        each distinct coefficient of the bank is gathered once and its plane feeds the taps of every kernel.
 
+        :param padded: A 2D numpy array (H + kh - 1, W + kw - 1), kh and kw the largest kernel height and width.
+        :param kernels: A list of F 2D numpy arrays.
+        :return: int32 array (F, H, W), or (F, H, W, K) for a LUT stack.
+        """
+        kh = max(kernel.shape[0] for kernel in kernels)
+        kw = max(kernel.shape[1] for kernel in kernels)
+        h = padded.shape[0] - kh + 1
+        w = padded.shape[1] - kw + 1
+
+        # Clip pixel values to [-128, 127] once, as LUT indices
+        padded_index = np.clip(padded, -128, 127).astype(np.intp) + 128
+
+        # Convolution sum: taps sharing a coefficient share one gathered plane, summed over its shifted views.
+        # The LUT axis of a stack stays last until the end, so a gather reads K neighbouring products.
+        acc = np.zeros((len(kernels), h, w) + self.lut.shape[:-2], dtype=np.int32)
+        for column, taps in self.coefficient_columns(kernels):
+            plane = np.take(column, padded_index, axis=0)
+            for f, ki, kj in taps:
+                acc[f] += plane[ki:ki + h, kj:kj + w]
+        return acc
+
+    def filter_bank(self, image, kernels, magnitude=None):
+        """
+        Apply a bank of kernels to an image in one pass: the image is padded once and every distinct
+        coefficient of the bank is gathered once, instead of one full convolution per kernel.
+
+        :param image: A numpy array (H, W) or (H, W, C) in [-128, 127].
+        :param kernels: A dict {name: 2D kernel}, e.g. KERNELS entries. Kernels of different sizes are centred.
+        :param magnitude: Optional (name_x, name_y) of two kernels of the bank, e.g. ("sobel_x", "sobel_y"):
+                          adds the gradient magnitude sqrt(x^2 + y^2) of their unclipped sums as "magnitude".
+        :return: A dict {name: filtered image}, each like the result of convolve_2d_lut / sharpen_color_image
+                 (LUT axis of a stack first), dtype int16, clipped to [-128, 127].
+        """
+        names = list(kernels)
+        bank = [np.asarray(kernels[name]) for name in names]
+        kh = max(kernel.shape[0] for kernel in bank)
+        kw = max(kernel.shape[1] for kernel in bank)
+        planes = image[..., None] if image.ndim == 2 else image
+        h, w, c = planes.shape
+
+        outputs = {name: [] for name in names + (["magnitude"] if magnitude else [])}
+        padded = np.zeros((h + kh - 1, w + kw - 1), dtype=np.int16)
+        for ch in range(c):
+            padded[kh // 2:kh // 2 + h, kw // 2:kw // 2 + w] = planes[:, :, ch]
+            acc = self.accumulate_padded(padded, bank)
+            clipped = np.clip(acc, -128, 127).astype(np.int16)
+            for f, name in enumerate(names):
+                outputs[name].append(clipped[f])
+            if magnitude:
+                x = acc[names.index(magnitude[0])].astype(np.float64)
+                y = acc[names.index(magnitude[1])].astype(np.float64)
+                outputs["magnitude"].append(np.clip(np.hypot(x, y), 0, 127).astype(np.int16))
+
+        results = {}
+        for name, channels in outputs.items():
+            result = np.stack(channels, axis=-1) if image.ndim == 3 else channels[0]
+            # LUT axis of a stack from behind the image axes to the front
+            results[name] = np.moveaxis(result, 2, 0) if self.lut.ndim == 3 else result
+        return results
+
+    def convolve_rows(self, rows, kernel):
+        """
+        Streaming line-buffer convolution of a single-channel image, row by row as in hardware pipelines.
+        Only a rolling window of the last kh padded rows is kept, already gathered from the LUT column of every
+        distinct coefficient, so arbitrarily tall images are filtered in O(width) memory.
+        The result equals convolve_2d_lut on the whole image.
+
+        :param rows: An iterable of 1D numpy arrays (W,) in the range [-128, 127], e.g. a generator reading a strip.
+        :param kernel: A 2D numpy array (kh, kw).
+        :return: A generator of int16 output rows (W,), or (K, W) for a LUT stack, clipped to [-128, 127].
+                 Output row i is yielded as soon as input row i + kh - 1 - kh // 2 has been read.
+        """
+        kernel = np.asarray(kernel)
+        kh, kw = kernel.shape
+        pad_h = kh // 2
+        pad_w = kw // 2
+        columns = self.coefficient_columns([kernel])
+
+        window = None
+        pushed = 0
+        w = 0
+
+        def push(row):
+            # gather the padded row once per coefficient into its slot of the ring buffer
+            nonlocal pushed
+            padded_index = np.full(w + kw - 1, 128, dtype=np.intp)
+            padded_index[pad_w:pad_w + w] = np.clip(row, -128, 127).astype(np.intp) + 128
+            for c, (column, _) in enumerate(columns):
+                window[c, pushed % kh] = np.take(column, padded_index, axis=0)
+            pushed += 1
+
+        def emit():
+            # output row i reads the padded rows i .. i + kh - 1
+            i = pushed - kh
+            acc = np.zeros((w,) + self.lut.shape[:-2], dtype=np.int32)
+            for c, (_, taps) in enumerate(columns):
+                for _, ki, kj in taps:
+                    acc += window[c, (i + ki) % kh, kj:kj + w]
+            return np.moveaxis(np.clip(acc, -128, 127).astype(np.int16), range(1, acc.ndim), range(acc.ndim - 1))
+
+        for row in rows:
+            if window is None:
+                w = len(row)
+                window = np.zeros((len(columns), kh, w + kw - 1) + self.lut.shape[:-2], dtype=np.int32)
+                # top zero-padding rows
+                for _ in range(pad_h):
+                    push(np.zeros(w, dtype=np.int16))
+            push(row)
+            if pushed >= kh:
+                yield emit()
+
+        if window is not None:
+            # bottom zero-padding rows flush the last output rows
+            for _ in range(kh - 1 - pad_h):
+                push(np.zeros(w, dtype=np.int16))
+                if pushed >= kh:
+                    yield emit()
+
+    def iter_tiles(self, image, kernel, tile_size=DEFAULT_TILE_SIZE):
+        """
+        Split an image into zero-padded tiles with a halo of the kernel size, one channel at a time.
+
+        :param image: (H, W), (H, W, C) or a stack (N, ..., H, W, C), values in [-128, 127].
+        :param kernel: A 2D numpy array (kh, kw).
+        :param tile_size: Edge length of the output tiles.
+        :return: Generator of (output index, halo-padded int16 tile), the index selects the tile's
+                 pixels in an output of the image's shape.
+        """
+        kh, kw = kernel.shape
+        pad_h = kh // 2
+        pad_w = kw // 2
+        planes = image[..., None] if image.ndim == 2 else image
+        h, w = planes.shape[-3:-1]
+
+        for leading in np.ndindex(planes.shape[:-3]):
+            for ch in range(planes.shape[-1]):
+                plane = planes[leading + (Ellipsis, ch)]
+                for r0 in range(0, h, tile_size):
+                    for c0 in range(0, w, tile_size):
+                        r1 = min(r0 + tile_size, h)
+                        c1 = min(c0 + tile_size, w)
+                        # image rows and columns the tile reads, the rest of the halo stays zero
+                        top, left = r0 - pad_h, c0 - pad_w
+                        src_r0, src_r1 = max(top, 0), min(top + r1 - r0 + kh - 1, h)
+                        src_c0, src_c1 = max(left, 0), min(left + c1 - c0 + kw - 1, w)
+                        tile = np.zeros((r1 - r0 + kh - 1, c1 - c0 + kw - 1), dtype=np.int16)
+                        tile[src_r0 - top:src_r1 - top, src_c0 - left:src_c1 - left] = \
+                            plane[src_r0:src_r1, src_c0:src_c1]
+                        index = leading + (slice(r0, r1), slice(c0, c1))
+                        yield (index if image.ndim == 2 else index + (ch,)), tile
+
+    def filter_image_tiled(self, image, kernel, tile_size=DEFAULT_TILE_SIZE, workers=None, use_processes=False,
+                           out=None):
+        """
+        The LUT-based convolution of every channel of an image or image stack, tile by tile on a worker pool.
+        NumPy gathers release the GIL, so a thread pool already uses all cores; with use_processes the workers
+        load the LUT from self.lut_file themselves (a memory-mapped .npy is then shared through the page cache).
+        Only a bounded number of tiles is in flight, so memory stays bounded by the output.
+
+        :param image: (H, W), (H, W, C) or a stack (N, ..., H, W, C), values in [-128, 127]. May be memory-mapped.
+        :param kernel: A 2D numpy array (kh, kw).
+        :param tile_size: Edge length of the tiles.
+        :param workers: Number of workers, default os.cpu_count().
+        :param use_processes: Use a process pool instead of a thread pool.
+        :param out: None, a preallocated int16 array of the image's shape (with the leading LUT axis of a stack),
+                    or a .npy file path the result is memory-mapped into.
+        :return: The filtered image, same shape as image, dtype int16. For a LUT stack (K,) + image.shape.
+        """
+        stack_shape = self.lut.shape[:-2]
+        shape = stack_shape + image.shape
+        if out is None:
+            out = np.empty(shape, dtype=np.int16)
+        elif isinstance(out, str):
+            out = np.lib.format.open_memmap(out, mode="w+", dtype=np.int16, shape=shape)
+        elif out.shape != shape:
+            raise ValueError(f"out must have shape {shape}, got {out.shape}")
+
+        workers = workers or os.cpu_count() or 1
+        if use_processes:
+            executor = ProcessPoolExecutor(workers)
+            convolve = partial(_convolve_tile, self.lut_file)
+        else:
+            executor = ThreadPoolExecutor(workers)
+            convolve = self.convolve_padded
+
+        tasks = ((index, (tile, kernel)) for index, tile in self.iter_tiles(image, kernel, tile_size))
+        with executor:
+            for index, result in bounded_map(executor, convolve, tasks, 2 * workers):
+                out[(slice(None),) * len(stack_shape) + index] = result
         return out
 
+    def output_error_metrics(self, result, reference):
+        """
+        Error metrics of a LUT-based result against a reference, e.g. the same filter run with the exact LUT:
+        MED (mae), error rate, bias, worst pixel error and its (row, column, channel) position, etc.
+
+        :param result: A numpy array produced with this processor's LUT.
+        :param reference: A numpy array of the same shape, or of the shape of one output of a LUT stack.
+        :return: The dict of simulate_8bit_multiplier_py.metrics.error_metrics, for a LUT stack every value
+                 is an array with one entry per LUT.
+        """
+        result = np.asarray(result)
+        reference = np.asarray(reference)
+        stack_shape = result.shape[:result.ndim - reference.ndim]
+        positions = np.unravel_index(np.arange(reference.size), reference.shape)
+        return error_metrics(result.reshape(stack_shape + (-1,)), np.ravel(reference), operands=positions)
+
     def sharpen_color_image(self, image, kernel):
         """
         Apply a sharpening (or any other filter) to an RGB image
@@ -122,7 +437,7 @@ class LUTImageProcessor:
 
         :param image: A numpy array of shape (H, W, 3) in [-128, 127], dtype int16.
         :param kernel: A 2D numpy array for the convolution kernel, e.g. a sharpen kernel.
-        :return: The filtered image with the same shape (H, W, 3), dtype int16.
+        :return: The filtered image with the same shape (H, W, 3), or (K, H, W, 3) for a LUT stack, dtype int16.
         """
         # Split into R, G, B channels
         r, g, b = image[:, :, 0], image[:, :, 1], image[:, :, 2]
@@ -140,48 +455,48 @@ class LUTImageProcessor:
         """
         Blend two RGB images by computing alpha * img1 + (1 - alpha) * img2
         using the LUT-based multiplication approach.
+        alpha_int and inv_alpha_int are constant per alpha, so both products are gathered from
+        their 256-entry LUT columns for all pixels at once.
 
-        :param img1_int8: First image, shape (H, W, 3), values in [-128, 127].
-        :param img2_int8: Second image, shape (H, W, 3), values in [-128, 127].
-        :param alpha: A float in [0,1] controlling the blend ratio.
+        :param img1_int8: First image, shape (H, W, 3) or a stack (N, H, W, 3), values in [-128, 127].
+        :param img2_int8: Second image or stack, broadcastable with img1_int8, values in [-128, 127].
+        :param alpha: A float in [0,1] controlling the blend ratio, or a sequence of them for a blend sweep.
         :return: The blended image (H, W, 3), dtype int16, still in [-128, 127].
+                 For a sequence of alphas, one blended image per alpha along a new leading axis,
+                 followed by the LUT axis of a stack.
         """
-        # Convert alpha to integer in the range [0, 127]
-        alpha_int = int(alpha * 127)
-        inv_alpha_int = 127 - alpha_int  # for (1 - alpha)
-
-        h, w, c = img1_int8.shape
-        out = np.zeros_like(img1_int8, dtype=np.int16)
-
-        for i in range(h):
-            for j in range(w):
-                for ch in range(c):
-                    val1 = img1_int8[i, j, ch]
-                    val2 = img2_int8[i, j, ch]
-
-                    # Clip image values to [-128, 127]
-                    val1 = max(min(val1, 127), -128)
-                    val2 = max(min(val2, 127), -128)
-
-                    # LUT-based multiplication
-                    part1 = self.lut_multiply(val1, alpha_int)
-                    part2 = self.lut_multiply(val2, inv_alpha_int)
-
-                    # Sum up the weighted channels, then integer division by 127
-                    temp_sum = part1 + part2
-                    blended_val = temp_sum // 127  # approximate division by 127
-
-                    # Clip result
-                    blended_val = max(min(blended_val, 127), -128)
-                    out[i, j, ch] = blended_val
-
-        return out
+        # Clip image values to [-128, 127] once, as LUT indices
+        index1 = np.clip(img1_int8, -128, 127).astype(np.intp) + 128
+        index2 = np.clip(img2_int8, -128, 127).astype(np.intp) + 128
+        lut = np.asarray(self.lut)
+
+        alphas = np.atleast_1d(alpha)
+        out = np.empty((alphas.size,) + lut.shape[:-2] + np.broadcast_shapes(index1.shape, index2.shape),
+                       dtype=np.int16)
+        for n, alpha_value in enumerate(alphas):
+            # Convert alpha to integer in the range [0, 127]
+            alpha_int = int(alpha_value * 127)
+            inv_alpha_int = 127 - alpha_int  # for (1 - alpha)
+
+            # LUT-based multiplication, then integer division by 127 (approximate division, floored)
+            temp_sum = (np.take(lut[..., alpha_int + 128].astype(np.int32), index1, axis=-1)
+                        + np.take(lut[..., inv_alpha_int + 128].astype(np.int32), index2, axis=-1))
+            out[n] = np.clip(temp_sum // 127, -128, 127)
+
+        return out if np.ndim(alpha) else out[0]
+
+    def _check_single_lut(self, demo):
+        # the demos plot and save one image per sample, a LUT stack gives K of them
+        if self.lut.ndim != 2:
+            raise ValueError(f"{demo}() shows a single LUT, the processor holds a stack of {len(self.lut)}: "
+                             f"call sharpen_color_image / blend_images_lut and index the leading axis instead")
 
     def sharpening(self):
         """
         Demonstrates sharpening on sample images (astronaut and rocket) from skimage.
         Shows original vs. sharpened results.
         """
+        self._check_single_lut("sharpening")
         # Load sample images from skimage
         img_astronaut = data.astronaut()
         img_rocket = data.rocket()
@@ -192,12 +507,7 @@ class LUTImageProcessor:
         img_rocket_scaled = self.scale_to_int8(img_rocket)
         img_coffee_scaled = self.scale_to_int8(img_coffee)
 
-        # Define a basic sharpening kernel
-        sharpen_kernel = np.array([
-            [-1, -1, -1],
-            [-1, 9, -1],
-            [-1, -1, -1]
-        ], dtype=np.int16)
+        sharpen_kernel = KERNELS["sharpen"]
 
         # Apply sharpening via LUT-based convolution
         astronaut_sharpened = self.sharpen_color_image(img_astronaut_scaled, sharpen_kernel)
@@ -249,6 +559,7 @@ class LUTImageProcessor:
         a Sobel-like kernel and LUT-based convolution.
         Shows original vs. edge-detected results.
         """
+        self._check_single_lut("edge_detection")
         # Load sample images from skimage
         img_astronaut = data.astronaut()
         img_rocket = data.rocket()
@@ -259,12 +570,8 @@ class LUTImageProcessor:
         img_rocket_scaled = self.scale_to_int8(img_rocket)
         img_coffee_scaled = self.scale_to_int8(img_coffee)
 
-        # Define a vertical Sobel-like kernel
-        edge_kernel = np.array([
-            [-1, -2, -1],
-            [0, 0, 0],
-            [1, 2, 1]
-        ], dtype=np.int16)
+        # Vertical Sobel kernel
+        edge_kernel = KERNELS["edge"]
 
         # Apply edge detection using LUT-based convolution
         astronaut_edges = self.sharpen_color_image(img_astronaut_scaled, edge_kernel)
@@ -314,6 +621,7 @@ class LUTImageProcessor:
 
         :param alpha: Blend ratio (float in [0,1]). Default is 0.5.
         """
+        self._check_single_lut("blend_images")
         # 1) Load sample images
         img_astronaut = data.astronaut()
         img_retina = data.retina()
@@ -400,7 +708,12 @@ if __name__ == "__main__":
     # Demonstrate blending with alpha=0.5
     processor.blend_images(alpha=0.5)
 
-
-
-
-
+    # Compare all multipliers in one pass on a LUT stack, against the exact LUT (the first one)
+    lut_files = [os.path.join(LUT_DIR, f"{name}_multiplication_LUT.csv")
+                 for name in ("exact", "appro1", "appro2", "appro3")]
+    stacked_processor = LUTImageProcessor(lut_files)
+    sharpened = stacked_processor.sharpen_color_image(stacked_processor.scale_to_int8(data.astronaut()),
+                                                      KERNELS["sharpen"])
+    metrics = stacked_processor.output_error_metrics(sharpened, sharpened[0])
+    for lut_file, med, error_rate in zip(lut_files, metrics["mae"], metrics["error_rate"]):
+        print(f"{os.path.basename(lut_file)}: MED {med:.4f}, Error Rate {error_rate:.4f}")